@@ -0,0 +1,44 @@
+"""
+Compare two benchmark result files from benchmarks.run:
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+
+
+def load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return {
+        (result["name"], result["scale"]["spots"], result["scale"]["detections_per_spot"]): result
+        for result in report["results"]
+    }
+
+
+def compare(before, after):
+    """
+    Returns:
+        list[tuple]: (name, spots, detections per spot, before median, after median, after / before)
+            for every case present in both
+    """
+    rows = []
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key]["median"], after[key]["median"]
+        rows.append((*key, old, new, new / old if old else float("nan")))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args(argv)
+
+    print(f"{'case':<36} {'scale':>14} {'before s':>10} {'after s':>10} {'ratio':>7}")
+    for name, spots, detections, old, new, ratio in compare(load(args.before), load(args.after)):
+        print(f"{name:<36} {f'{spots}x{detections}':>14} {old:>10.4f} {new:>10.4f} {ratio:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Benchmark the ingestion, rollup and active spot paths of counter.models at several scales.
+
+Runs against a throwaway test database created from the configured DATABASES, so any local
+Postgres the settings point at can be used. Geocoding, timezones and cam probes use the offline
+backends of counter.fakes unless --online is given. Writes JSON results to diff with benchmarks.compare:
+
+    python -m benchmarks.run --scales 10x1000,100x10000,500x10000 --output before.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import django
+
+BENCHMARK_RESULT_VERSION = 1
+DEFAULT_SCALES = "10x1000,100x10000"
+DEFAULT_REPEAT = 3
+
+OFFLINE_SETTINGS = dict(
+    SPOT_ENRICHMENT="sync",
+    SPOT_GEOCODER="counter.fakes.FakeGeocoder",
+    SPOT_TIMEZONE_FINDER="counter.fakes.FakeTimezoneFinder",
+    CAM_PROBER="counter.fakes.FakeCamProber",
+)
+
+
+class Timer:
+    """Times one benchmark case over a number of repeats, counting the queries of each run"""
+
+    def __init__(self, name, scale, repeat):
+        self.name = name
+        self.scale = scale
+        self.repeat = repeat
+        self.seconds = []
+        self.queries = []
+
+    def run(self, fn, setup=None):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                fn()
+                self.seconds.append(time.perf_counter() - start)
+            self.queries.append(len(queries))
+        return self
+
+    def result(self):
+        return dict(
+            name=self.name,
+            scale=self.scale,
+            repeat=self.repeat,
+            seconds=self.seconds,
+            median=statistics.median(self.seconds),
+            min=min(self.seconds),
+            queries=max(self.queries),
+        )
+
+
+def parse_scales(value):
+    """Parse spots x detections per spot pairs, e.g. 10x1000,100x10000"""
+    scales = []
+    for item in value.split(","):
+        spots, detections = item.lower().split("x")
+        scales.append(dict(spots=int(spots), detections_per_spot=int(detections)))
+    return scales
+
+
+def run_scale(scale, repeat=DEFAULT_REPEAT, ingest_batch=1000):
+    """
+    Seed one scale into an empty database and time every case against it.
+
+    Returns:
+        list[dict]: One result per case
+    """
+    from counter.ingest import ingest_detections
+    from counter.models import Spot
+
+    from .seed import seed_datapoints, seed_spots
+
+    spots = seed_spots(scale["spots"])
+    scale = dict(scale, rows=seed_datapoints(spots, scale["detections_per_spot"]))
+    queryset = Spot.objects.filter(pk__in=[spot.pk for spot in spots])
+    sample = spots[: min(len(spots), 10)]
+
+    def timer(name):
+        return Timer(name, scale, repeat)
+
+    def create_spots():
+        for i in range(10):
+            Spot.objects.create(
+                name=f"Created spot {i}", major_city="San Clemente", country="United States", postal_code="92672"
+            ).update_times()
+
+    def expire_cam_checks():
+        queryset.update(cam_next_check_at=None)
+
+    results = [
+        timer("ingest_detections").run(lambda: ingest_detections([(spot, None, 1) for spot in spots] * ingest_batch)),
+        timer("aggregate_all").run(queryset.aggregate_all),
+        timer("aggregate_datapoints x10").run(lambda: [spot.aggregate_datapoints() for spot in sample]),
+        timer("average_all").run(queryset.average_all),
+        timer("average_aggregated_datapoints x10").run(
+            lambda: [spot.average_aggregated_datapoints() for spot in sample]
+        ),
+        timer("rebuild_hourly_averages").run(queryset.rebuild_hourly_averages),
+        timer("update_hourly_averages x10").run(lambda: [list(spot.update_hourly_averages()) for spot in sample]),
+        timer("update_all_times").run(queryset.update_all_times),
+        timer("update_times x10").run(lambda: [spot.update_times() for spot in sample]),
+        timer("active").run(lambda: list(Spot.objects.active(cam_check=False))),
+        timer("active with cam checks").run(lambda: list(Spot.objects.active()), setup=expire_cam_checks),
+        timer("create_spot x10").run(create_spots),
+        timer("snapshot").run(lambda: list(queryset.snapshot())),
+    ]
+    Spot.objects.all().delete()
+    return [result.result() for result in results]
+
+
+def environment():
+    from django.db import connection
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return dict(
+        commit=commit,
+        python=platform.python_version(),
+        django=django.get_version(),
+        postgres=connection.pg_version,
+        machine=platform.machine(),
+        time=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="Comma separated spots x detections per spot")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--ingest-batch", type=int, default=1000, help="Detections per spot per ingest run")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout")
+    parser.add_argument("--keepdb", action="store_true", help="Reuse and keep the benchmark database")
+    parser.add_argument("--online", action="store_true", help="Use the configured geocoder, timezones and cams")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings.test_settings")
+    django.setup()
+    from django.db import connection
+    from django.test.utils import override_settings
+
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, keepdb=args.keepdb)
+    try:
+        with override_settings(**({} if args.online else OFFLINE_SETTINGS)):
+            results = []
+            for scale in parse_scales(args.scales):
+                print(
+                    f"Benchmarking {scale['spots']} spots x {scale['detections_per_spot']} detections", file=sys.stderr
+                )
+                results.extend(run_scale(scale, args.repeat, args.ingest_batch))
+        report = dict(
+            version=BENCHMARK_RESULT_VERSION, environment=dict(environment(), online=args.online), results=results
+        )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=args.keepdb)
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Fast synthetic data for the benchmarks. Spots are inserted with one bulk_create, already located,
+and datapoints are generated inside Postgres with generate_series, so seeding millions of rows
+doesn't go through Python objects.
+"""
+import random
+
+from django.db import connection
+
+from counter.models import AggregateDataPoint, AverageDataPoint, DetectionDataPoint, Spot
+from counter.partitions import ensure_all_partitions
+
+# (timezone, lat, lng) of real surf regions, so sun times and local hours are realistic
+LOCATIONS = [
+    ("America/Los_Angeles", 33.38, -117.59),
+    ("America/New_York", 40.58, -73.81),
+    ("Pacific/Honolulu", 21.66, -158.05),
+    ("Europe/Lisbon", 38.70, -9.42),
+    ("Australia/Sydney", -33.89, 151.27),
+    ("Asia/Tokyo", 35.31, 139.48),
+]
+
+# Seconds between datapoints, as written by the pipeline
+DETECTION_INTERVAL = 30
+AGGREGATE_INTERVAL = 5 * 60
+AVERAGE_INTERVAL = 30 * 60
+
+
+def seed_spots(count, seed=0):
+    """
+    Returns:
+        list[Spot]: count enabled, located spots spread over LOCATIONS
+    """
+    rng = random.Random(seed)
+    spots = []
+    for i in range(count):
+        tz, lat, lng = LOCATIONS[i % len(LOCATIONS)]
+        spots.append(
+            Spot(
+                name=f"Benchmark spot {i}",
+                major_city="Benchmark",
+                country="Benchmark",
+                postal_code=str(i),
+                url=f"http://127.0.0.1:9/{i}/playlist.m3u8",
+                lat=lat + rng.uniform(-0.5, 0.5),
+                lng=lng + rng.uniform(-0.5, 0.5),
+                timezone=tz,
+            )
+        )
+    return Spot.objects.bulk_create(spots)
+
+
+def _generate(model, spot_ids, per_spot, interval, time_info=False):
+    table = model._meta.db_table
+    columns = "spot_id, timestamp, count"
+    values = "s.id, now() - g * %s * interval '1 second', (random() * 40)::integer"
+    if time_info:
+        local = "(now() - g * %s * interval '1 second') AT TIME ZONE s.timezone"
+        columns += ", hour_id, day_id, month_id"
+        values += (
+            f", EXTRACT(HOUR FROM {local})::integer, EXTRACT(ISODOW FROM {local})::integer - 1,"
+            f" EXTRACT(MONTH FROM {local})::integer"
+        )
+    params = [interval] * (4 if time_info else 1) + [per_spot, spot_ids]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} ({columns})
+            SELECT {values}
+            FROM {Spot._meta.db_table} s CROSS JOIN generate_series(1, %s) g
+            WHERE s.id = ANY(%s)
+            """,
+            params,
+        )
+        return cursor.rowcount
+
+
+def seed_datapoints(spots, detections_per_spot):
+    """
+    Fill the datapoint history of the spots, newest first back from now. Aggregates and averages are
+    generated at the pipeline's rollup intervals over the same span as the detections.
+
+    Returns:
+        dict[str, int]: Rows inserted per model
+    """
+    ensure_all_partitions()
+    spot_ids = [spot.pk for spot in spots]
+    span = detections_per_spot * DETECTION_INTERVAL
+    rows = {
+        "DetectionDataPoint": _generate(DetectionDataPoint, spot_ids, detections_per_spot, DETECTION_INTERVAL),
+        "AggregateDataPoint": _generate(
+            AggregateDataPoint, spot_ids, max(span // AGGREGATE_INTERVAL, 1), AGGREGATE_INTERVAL
+        ),
+        "AverageDataPoint": _generate(
+            AverageDataPoint, spot_ids, max(span // AVERAGE_INTERVAL, 1), AVERAGE_INTERVAL, time_info=True
+        ),
+    }
+    with connection.cursor() as cursor:
+        for model in (DetectionDataPoint, AggregateDataPoint, AverageDataPoint, Spot):
+            cursor.execute(f"ANALYZE {model._meta.db_table}")
+    return rows
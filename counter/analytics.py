@@ -0,0 +1,163 @@
+import numpy as np
+from django.db import connection
+from django.db.models import F, Func, IntegerField
+
+from .models import AverageDataPoint
+
+DEFAULT_CHUNK_SIZE = 50000
+
+HEATMAP_SHAPE = (12, 7, 24)
+
+
+class Epoch(Func):
+    """Seconds since the unix epoch of a datetime column"""
+
+    template = "EXTRACT(EPOCH FROM %(expressions)s)::bigint"
+    output_field = IntegerField()
+
+
+def datapoint_arrays(queryset, fields=("spot_id", "timestamp", "count"), chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Read columns of a datapoint queryset into NumPy arrays through a server side cursor, in chunks,
+    without building model instances or enum members. Any filtering is done on the queryset beforehand.
+
+    Args:
+        queryset (Queryset): A datapoint queryset
+        fields (Iterable[str], optional):
+            Defaults to spot_id, timestamp, and count.
+            Column names. timestamp is returned as int64 epoch seconds, enum fields as their integer values.
+        chunk_size (int, optional):
+            Defaults to DEFAULT_CHUNK_SIZE.
+            Rows fetched per round trip.
+
+    Returns:
+        dict[str, np.ndarray]: One int64 array per field
+    """
+    fields = list(fields)
+    columns = {field: Epoch(field) if field == "timestamp" else F(field) for field in fields}
+    aliases = {field: f"_{field}" for field in fields}
+    sql, params = (
+        queryset.order_by()
+        .annotate(**{aliases[field]: expression for field, expression in columns.items()})
+        .values_list(*aliases.values())
+        .query.sql_with_params()
+    )
+
+    chunks = []
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            chunks.append(np.array(rows, dtype=np.int64).reshape(len(rows), len(fields)))
+    data = np.concatenate(chunks) if chunks else np.empty((0, len(fields)), dtype=np.int64)
+    return {field: data[:, i] for i, field in enumerate(fields)}
+
+
+def grouped_percentiles(groups, values, n_groups, q):
+    """
+    Linear interpolated percentiles of values per group, computed with one sort.
+
+    Args:
+        groups (np.ndarray): Group index of each value, in range(n_groups)
+        values (np.ndarray): The values
+        n_groups (int): Number of groups
+        q (Iterable[float]): Percentiles in [0, 100]
+
+    Returns:
+        np.ndarray: Shape (n_groups, len(q)), NaN for empty groups
+    """
+    q = np.asarray(q, dtype=float) / 100
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order].astype(float)
+    sizes = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+    position = starts[:, None] + q[None, :] * np.maximum(sizes - 1, 0)[:, None]
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, starts[:, None] + np.maximum(sizes - 1, 0)[:, None])
+    result = np.full((n_groups, len(q)), np.nan)
+    filled = sizes > 0
+    if values.size:
+        lower_values = values[np.minimum(lower, values.size - 1)]
+        upper_values = values[np.minimum(upper, values.size - 1)]
+        interpolated = lower_values + (position - lower) * (upper_values - lower_values)
+        result[filled] = interpolated[filled]
+    return result
+
+
+def grouped_stats(groups, values, n_groups, q=(50, 90)):
+    """
+    Sample count, mean and percentiles of values per group.
+
+    Returns:
+        dict[str, np.ndarray]: samples and mean of shape (n_groups,), percentiles of shape (n_groups, len(q))
+    """
+    samples = np.bincount(groups, minlength=n_groups)
+    sums = np.bincount(groups, weights=values, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(samples > 0, sums / samples, np.nan)
+    return dict(samples=samples, mean=mean, percentiles=grouped_percentiles(groups, values, n_groups, q))
+
+
+def crowd_heatmap(spot, since=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Month x weekday x hour crowd statistics of a spot from its AverageDataPoints, in local time.
+
+    Args:
+        spot (Spot | int): The spot or its id
+        since (datetime.datetime, optional): Only use datapoints newer than this
+
+    Returns:
+        dict[str, np.ndarray]: samples, mean, median, and p90, each of shape HEATMAP_SHAPE
+            indexed [month - 1, weekday, hour]. Cells without data are NaN.
+    """
+    queryset = AverageDataPoint.objects.filter(spot=spot, hour_id__isnull=False)
+    if since is not None:
+        queryset = queryset.filter(timestamp__gt=since)
+    data = datapoint_arrays(queryset, ("month_id", "day_id", "hour_id", "count"), chunk_size)
+
+    cells = np.ravel_multi_index((data["month_id"] - 1, data["day_id"], data["hour_id"]), HEATMAP_SHAPE)
+    n_cells = int(np.prod(HEATMAP_SHAPE))
+    stats = grouped_stats(cells, data["count"], n_cells, q=(50, 90))
+    return dict(
+        samples=stats["samples"].reshape(HEATMAP_SHAPE),
+        mean=stats["mean"].reshape(HEATMAP_SHAPE),
+        median=stats["percentiles"][:, 0].reshape(HEATMAP_SHAPE),
+        p90=stats["percentiles"][:, 1].reshape(HEATMAP_SHAPE),
+    )
+
+
+def spot_count_stats(queryset, q=(50, 90), chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Per spot sample count, mean and percentiles of the counts in a datapoint queryset.
+
+    Returns:
+        tuple[np.ndarray, dict[str, np.ndarray]]: The sorted spot ids and grouped_stats aligned with them
+    """
+    data = datapoint_arrays(queryset, ("spot_id", "count"), chunk_size)
+    spot_ids, groups = np.unique(data["spot_id"], return_inverse=True)
+    return spot_ids, grouped_stats(groups.ravel(), data["count"], len(spot_ids), q)
+
+
+def spot_count_histograms(queryset, bins, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Histogram of the counts of each spot in a datapoint queryset.
+
+    Args:
+        bins (Sequence[int]): Monotonic bin edges, as for np.histogram
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The sorted spot ids and a (spots, len(bins) - 1) array of bin counts
+    """
+    bins = np.asarray(bins)
+    data = datapoint_arrays(queryset, ("spot_id", "count"), chunk_size)
+    spot_ids, groups = np.unique(data["spot_id"], return_inverse=True)
+    n_bins = len(bins) - 1
+    # Match np.histogram: right edge of the last bin is inclusive, values outside the edges are dropped
+    bin_index = np.searchsorted(bins, data["count"], side="right") - 1
+    bin_index[data["count"] == bins[-1]] = n_bins - 1
+    inside = (bin_index >= 0) & (bin_index < n_bins)
+    flat = groups.ravel()[inside] * n_bins + bin_index[inside]
+    return spot_ids, np.bincount(flat, minlength=len(spot_ids) * n_bins).reshape(len(spot_ids), n_bins)
@@ -0,0 +1,128 @@
+"""
+Query budgets for the ORM hot paths. A budget caps the SQL statements and the total database time of
+an operation, so a per spot or per datapoint query that slips into a path that should be O(1) fails
+loudly with the offending statements instead of silently slowing down the pipeline:
+
+    with QueryBudget("rollup.average_all"):
+        Spot.objects.average_all()
+
+    @QueryBudget(max_queries=2)
+    def refresh():
+        ...
+"""
+import copy
+import time
+from contextlib import ContextDecorator
+
+from django.conf import settings
+from django.db import connections
+
+# Maximum statements per call of the named operations, with a cold spot metadata cache.
+# None of them depend on the number of spots or datapoints involved.
+DEFAULT_QUERY_BUDGETS = {
+    "ingest.detections": 2,
+    "rollup.aggregate_all": 2,
+    "rollup.average_all": 4,
+    "rollup.rebuild_hourly_averages": 2,
+    "rollup.refresh_crowd_forecasts": 18,
+    "spot.active": 4,
+    "spot.snapshot": 1,
+    "spot.update_all_times": 3,
+    "spot.update_times": 2,
+    "spot.aggregate_datapoints": 2,
+    "spot.average_aggregated_datapoints": 4,
+    "spot.update_hourly_averages": 3,
+    "spot.create": 5,
+    "datapoint.create_average": 3,
+    "datapoint.create_detection": 2,
+    "datapoint.create_surf_quality": 3,
+}
+
+MAX_REPORTED_SQL = 300
+
+
+def query_budgets():
+    """DEFAULT_QUERY_BUDGETS updated with the QUERY_BUDGETS setting"""
+    return {**DEFAULT_QUERY_BUDGETS, **getattr(settings, "QUERY_BUDGETS", {})}
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudget(ContextDecorator):
+    """
+    Fail when the wrapped block runs more statements or spends more time in the database than allowed.
+
+    Args:
+        name (str, optional):
+            A query_budgets operation, its budget is used when max_queries isn't given.
+        max_queries (int, optional):
+            Maximum SQL statements.
+        max_seconds (float, optional):
+            Maximum total time spent executing statements.
+        using (str, optional):
+            Defaults to default.
+            Database alias to watch.
+
+    Raises:
+        QueryBudgetExceeded: On exit, listing every statement run, if a limit was exceeded
+    """
+
+    def __init__(self, name=None, max_queries=None, max_seconds=None, using="default"):
+        if max_queries is None and name is not None:
+            budgets = query_budgets()
+            if name not in budgets:
+                raise KeyError(f"No query budget named {name}")
+            max_queries = budgets[name]
+        if max_queries is None and max_seconds is None:
+            raise ValueError("A query budget needs a name, max_queries or max_seconds")
+        self.name = name
+        self.max_queries = max_queries
+        self.max_seconds = max_seconds
+        self.using = using
+        self.queries = []
+        self._wrapper = None
+
+    def _recreate_cm(self):
+        # Each decorated call gets its own budget, so concurrent and recursive calls don't share counts
+        return copy.copy(self)
+
+    @property
+    def seconds(self):
+        return sum(duration for _, duration in self.queries)
+
+    def _record(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    def __enter__(self):
+        self.queries = []
+        self._wrapper = connections[self.using].execute_wrapper(self._record)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._wrapper.__exit__(exc_type, exc, traceback)
+        if exc_type is not None:
+            return False
+        problems = []
+        if self.max_queries is not None and len(self.queries) > self.max_queries:
+            problems.append(f"{len(self.queries)} queries, budget {self.max_queries}")
+        if self.max_seconds is not None and self.seconds > self.max_seconds:
+            problems.append(f"{self.seconds:.3f}s in the database, budget {self.max_seconds}s")
+        if problems:
+            raise QueryBudgetExceeded(self.report(problems))
+        return False
+
+    def report(self, problems=()):
+        label = self.name or "block"
+        lines = [f"Query budget of {label} exceeded: {', '.join(problems)}" if problems else label]
+        for number, (sql, duration) in enumerate(self.queries, start=1):
+            if len(sql) > MAX_REPORTED_SQL:
+                sql = f"{sql[:MAX_REPORTED_SQL]}..."
+            lines.append(f"  {number}. [{duration * 1000:.1f}ms] {sql}")
+        return "\n".join(lines)
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytz
+from django.conf import settings
+
+DEFAULT_SPOT_CACHE_TTL = 300
+
+SPOT_META_FIELDS = ("pk", "timezone", "lat", "lng", "enabled", "_sunrise", "_sunset")
+
+
+class SpotMeta:
+    """The Spot fields read on hot paths, with the timezone already resolved"""
+
+    __slots__ = ("pk", "tz", "lat", "lng", "enabled", "sunrise", "sunset")
+
+    def __init__(self, pk, timezone, lat, lng, enabled, sunrise, sunset):
+        self.pk = pk
+        self.tz = pytz.timezone(timezone)
+        self.lat = lat
+        self.lng = lng
+        self.enabled = enabled
+        self.sunrise = sunrise
+        self.sunset = sunset
+
+
+class SpotMetaCache:
+    """
+    Process local spot id -> SpotMeta cache.
+
+    Every located spot is loaded with one query on first use and reloaded after SPOT_CACHE_TTL seconds,
+    so changes made by other processes are picked up. Local saves invalidate their entry immediately.
+    Unknown spots and spots without a timezone yet are cached as None until the next reload or invalidation,
+    so repeated lookups of them don't each cost a query.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _ttl(self):
+        return getattr(settings, "SPOT_CACHE_TTL", DEFAULT_SPOT_CACHE_TTL)
+
+    def _query(self, **filters):
+        from .models import Spot
+
+        return {
+            row[0]: SpotMeta(*row)
+            for row in Spot.objects.filter(timezone__isnull=False, **filters).values_list(*SPOT_META_FIELDS)
+        }
+
+    def _expired(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self._ttl()
+
+    def load(self):
+        entries = self._query()
+        with self._lock:
+            self._entries = entries
+            self._loaded_at = time.monotonic()
+
+    def prime(self, spot_ids):
+        """Make sure every spot id is cached, loading the missing ones in one query"""
+        if self._expired():
+            self.load()
+        missing = set(spot_ids).difference(self._entries)
+        if missing:
+            entries = dict.fromkeys(missing)
+            entries.update(self._query(pk__in=missing))
+            with self._lock:
+                self._entries.update(entries)
+
+    def get(self, spot_id):
+        """
+        Returns:
+            SpotMeta: The cached spot metadata, or None for an unknown or unlocated spot
+        """
+        self.prime([spot_id])
+        return self._entries.get(spot_id)
+
+    def timezone(self, spot_id):
+        meta = self.get(spot_id)
+        return meta.tz if meta else None
+
+    def invalidate(self, spot_ids=None):
+        """Drop the given spots, or everything, so they are reread on next access"""
+        with self._lock:
+            if spot_ids is None:
+                self._entries = {}
+                self._loaded_at = None
+            else:
+                for spot_id in spot_ids:
+                    self._entries.pop(spot_id, None)
+
+
+spot_cache = SpotMetaCache()
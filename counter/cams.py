@@ -0,0 +1,210 @@
+import datetime
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+from .cache import spot_cache
+from .metrics import instrument
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_CAM_CHECK_TIMEOUT = 5
+DEFAULT_CAM_CHECK_CONCURRENCY = 32
+DEFAULT_CAM_CHECK_TTL = 300
+DEFAULT_CAM_CHECK_MAX_BACKOFF = 6 * 60 * 60
+DEFAULT_CAM_STATUS_BATCH_SIZE = 200
+DEFAULT_CAM_PROBER = "counter.cams.HttpCamProber"
+
+CAM_STATUS_FIELDS = ["enabled", "cam_checked_at", "cam_failures", "cam_next_check_at"]
+
+# Servers that refuse HEAD get a one byte ranged GET instead
+HEAD_UNSUPPORTED = {403, 405, 501}
+
+_lock = threading.Lock()
+_prober = None
+
+
+def cam_check_timeout():
+    return getattr(settings, "CAM_CHECK_TIMEOUT", DEFAULT_CAM_CHECK_TIMEOUT)
+
+
+def cam_check_concurrency():
+    return getattr(settings, "CAM_CHECK_CONCURRENCY", DEFAULT_CAM_CHECK_CONCURRENCY)
+
+
+def cam_check_ttl():
+    return getattr(settings, "CAM_CHECK_TTL", DEFAULT_CAM_CHECK_TTL)
+
+
+def cam_check_max_backoff():
+    return getattr(settings, "CAM_CHECK_MAX_BACKOFF", DEFAULT_CAM_CHECK_MAX_BACKOFF)
+
+
+def next_check_delay(failures):
+    """
+    Seconds until a cam should be probed again. Healthy cams are rechecked after CAM_CHECK_TTL,
+    failing cams back off exponentially up to CAM_CHECK_MAX_BACKOFF.
+    """
+    ttl = cam_check_ttl()
+    if not failures:
+        return ttl
+    return min(ttl * 2 ** (failures - 1), cam_check_max_backoff())
+
+
+def record_cam_status(spot, ok, now):
+    """Update the cached cam state of a spot after a probe"""
+    spot.enabled = ok
+    spot.cam_failures = 0 if ok else spot.cam_failures + 1
+    spot.cam_checked_at = now
+    spot.cam_next_check_at = now + datetime.timedelta(seconds=next_check_delay(spot.cam_failures))
+
+
+def cam_session(pool_size=DEFAULT_CAM_CHECK_CONCURRENCY):
+    """A requests session whose connection pool is large enough to be shared by every check thread"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def probe_cam(url, session=None, timeout=None):
+    """
+    Check whether a cam url is serving, without downloading the playlist.
+
+    Args:
+        url (str): The cam playlist url
+        session (requests.Session, optional): Session to reuse connections from
+        timeout (float, optional):
+            Defaults to CAM_CHECK_TIMEOUT.
+            Connect and read timeout in seconds, so a hung cam can't stall the caller.
+
+    Returns:
+        bool: True if the cam responded successfully
+    """
+    if not url:
+        return False
+    session = session or requests
+    timeout = timeout or cam_check_timeout()
+    try:
+        r = session.head(url, timeout=timeout, allow_redirects=True)
+        if r.status_code in HEAD_UNSUPPORTED:
+            r = session.get(url, timeout=timeout, headers={"Range": "bytes=0-0"}, stream=True)
+            r.close()
+        return r.ok
+    except requests.RequestException as e:
+        LOGGER.warning(f"Cam check failed for {url}: {e}")
+        return False
+
+
+def _probe_in_worker(prober, url, session, timeout):
+    """
+    Probe from a pool thread. Workers only do network I/O, but Django connections are per thread,
+    so anything a worker opens by accident is closed here rather than left for Postgres to reap.
+    """
+    try:
+        return prober.probe(url, session, timeout)
+    finally:
+        connections.close_all()
+
+
+def _save_cam_statuses(model, spots, changed):
+    model.objects.bulk_update(spots, CAM_STATUS_FIELDS)
+    # bulk_update skips post_save, so drop the stale enabled flags here
+    spot_cache.invalidate([spot.pk for spot in changed])
+
+
+class HttpCamProber:
+    """Probe cams over HTTP with probe_cam. Any class with the same probe method can be set as CAM_PROBER."""
+
+    def probe(self, url, session=None, timeout=None):
+        """
+        Returns:
+            bool: True if the cam responded successfully
+        """
+        return probe_cam(url, session, timeout)
+
+
+def get_cam_prober():
+    """The CAM_PROBER instance, created once per process"""
+    global _prober
+    if _prober is None:
+        with _lock:
+            if _prober is None:
+                _prober = import_string(getattr(settings, "CAM_PROBER", DEFAULT_CAM_PROBER))()
+    return _prober
+
+
+@receiver(setting_changed, dispatch_uid="reset_cam_prober")
+def reset_cam_prober(setting, **kwargs):
+    """Drop the cached prober when override_settings swaps it"""
+    global _prober
+    if setting == "CAM_PROBER":
+        _prober = None
+
+
+@instrument("cams.check_cams")
+def check_cams(queryset, concurrency=None, timeout=None, batch_size=DEFAULT_CAM_STATUS_BATCH_SIZE):
+    """
+    Probe the cam of every spot in the queryset concurrently and save the results, including when
+    each cam is due to be checked again.
+
+    Probes run in a thread pool sized by CAM_CHECK_CONCURRENCY, not the CPU count, since they spend
+    their time waiting on the network. The pool threads never touch the database: results come back
+    to the calling thread, which is the only writer and saves them with a bulk_update every
+    batch_size results as they complete.
+
+    Args:
+        queryset (Queryset[Spot]): Spots to check
+        concurrency (int, optional):
+            Defaults to CAM_CHECK_CONCURRENCY.
+            Maximum number of cams probed at once.
+        timeout (float, optional):
+            Defaults to CAM_CHECK_TIMEOUT.
+        batch_size (int, optional):
+            Defaults to DEFAULT_CAM_STATUS_BATCH_SIZE.
+            Probe results saved per UPDATE.
+
+    Returns:
+        list[Spot]: The spots whose enabled flag changed
+    """
+    spots = list(queryset)
+    if not spots:
+        return []
+    workers = min(concurrency or cam_check_concurrency(), len(spots))
+    prober = get_cam_prober()
+    changed = []
+    batch = []
+    batch_changed = []
+    with cam_session(workers) as session, ThreadPoolExecutor(max_workers=workers) as pool:
+        # Only the url crosses into the workers, so they can't lazily load anything through the spot
+        futures = {pool.submit(_probe_in_worker, prober, spot.url, session, timeout): spot for spot in spots}
+        for future in as_completed(futures):
+            spot = futures[future]
+            try:
+                ok = future.result()
+            except Exception as e:
+                # A failing CAM_PROBER counts as a down cam rather than losing the batch
+                LOGGER.error(f"ERROR probing the cam of spot {spot.pk}: {e}")
+                ok = False
+            if spot.enabled != ok:
+                batch_changed.append(spot)
+            record_cam_status(spot, ok, timezone.now())
+            batch.append(spot)
+            if len(batch) >= batch_size:
+                _save_cam_statuses(queryset.model, batch, batch_changed)
+                changed.extend(batch_changed)
+                batch, batch_changed = [], []
+    if batch:
+        _save_cam_statuses(queryset.model, batch, batch_changed)
+        changed.extend(batch_changed)
+    return changed
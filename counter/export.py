@@ -0,0 +1,234 @@
+import csv
+import datetime
+import gzip
+import logging
+import os
+
+from django.db import connection
+
+from .watermarks import committed_id_bound
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_EXPORT_CHUNK_SIZE = 10000
+EXPORT_FORMATS = ("csv", "parquet")
+WATERMARK_FILE = "_watermark"
+
+
+def export_columns(model):
+    """The database columns of a datapoint model, foreign keys and enums as their raw values"""
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def model_directory(directory, model):
+    return os.path.join(directory, model._meta.db_table)
+
+
+def read_watermark(directory, model):
+    """
+    Returns:
+        int | None: The highest id covered by the last export of the model into directory
+    """
+    try:
+        with open(os.path.join(model_directory(directory, model), WATERMARK_FILE)) as f:
+            return int(f.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def write_watermark(directory, model, watermark):
+    path = os.path.join(model_directory(directory, model), WATERMARK_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w") as f:
+        f.write(str(watermark))
+    os.replace(f"{path}.tmp", path)
+
+
+class CsvPartWriter:
+    """Writes one partition as a gzip compressed CSV file with a header"""
+
+    extension = "csv.gz"
+
+    def __init__(self, path, columns):
+        self.file = gzip.open(path, "wt", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetPartWriter:
+    """Writes one partition as a Parquet file, one row group per chunk. Requires pyarrow."""
+
+    extension = "parquet"
+
+    def __init__(self, path, columns):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Parquet exports require pyarrow, install it or export as csv") from e
+
+        self.pyarrow = pyarrow
+        self.path = path
+        self.columns = columns
+        self.writer = None
+
+    def write(self, rows):
+        table = self.pyarrow.Table.from_arrays(
+            [self.pyarrow.array(values) for values in zip(*rows)], names=self.columns
+        )
+        if self.writer is None:
+            self.writer = self.pyarrow.parquet.ParquetWriter(self.path, table.schema, compression="zstd")
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+WRITERS = {"parquet": ParquetPartWriter, "csv": CsvPartWriter}
+
+
+class PartitionedExport:
+    """
+    Routes rows sorted by spot and timestamp into spot_id=<id>/date=<YYYY-MM-DD> partition directories,
+    keeping only the current partition open. Files are written under a .tmp suffix and only get their
+    final names on commit, so a failed export leaves no part files behind for its retry to duplicate.
+    """
+
+    def __init__(self, directory, columns, export_format, part_name):
+        self.directory = directory
+        self.columns = columns
+        self.writer_class = WRITERS[export_format]
+        self.part_name = part_name
+        self.spot_index = columns.index("spot_id")
+        self.timestamp_index = columns.index("timestamp")
+        self.key = None
+        self.writer = None
+        self.buffer = []
+        self.files = []
+        self.rows = 0
+
+    def write(self, rows):
+        for row in rows:
+            key = (row[self.spot_index], row[self.timestamp_index].astimezone(datetime.timezone.utc).date())
+            if key != self.key:
+                self._open(key)
+            self.buffer.append(row)
+        self._flush()
+
+    def _open(self, key):
+        self.close()
+        spot_id, date = key
+        directory = os.path.join(self.directory, f"spot_id={spot_id}", f"date={date.isoformat()}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.part_name}.{self.writer_class.extension}")
+        self.writer = self.writer_class(f"{path}.tmp", self.columns)
+        self.key = key
+        self.files.append(path)
+
+    def _flush(self):
+        if self.buffer:
+            self.writer.write(self.buffer)
+            self.rows += len(self.buffer)
+            self.buffer = []
+
+    def close(self):
+        if self.writer is not None:
+            self._flush()
+            self.writer.close()
+            self.writer = None
+
+    def commit(self):
+        """Give every written file its final name"""
+        for path in self.files:
+            os.replace(f"{path}.tmp", path)
+
+    def discard(self):
+        """Drop the buffered rows and remove every file written so far"""
+        self.buffer = []
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        for path in self.files:
+            try:
+                os.remove(f"{path}.tmp")
+            except FileNotFoundError:
+                pass
+
+
+def export_datapoints(
+    model,
+    directory,
+    after_id=None,
+    since=None,
+    export_format="csv",
+    chunk_size=DEFAULT_EXPORT_CHUNK_SIZE,
+):
+    """
+    Stream the rows of a datapoint model into files partitioned by spot and UTC day, through a server side
+    cursor so memory use stays at one chunk no matter the size of the table. Rows are read in
+    (spot, timestamp) order off the spot/timestamp index, so each partition file is written start to finish.
+
+    Incremental exports are keyed on ids rather than timestamps, so rows inserted late or with a backdated
+    timestamp are still picked up. Each run exports ids up to counter.watermarks.committed_id_bound, writes
+    new part files named after its id range so earlier ones are never overwritten, and records the bound
+    as the watermark for the next run.
+
+    Args:
+        model (Model): A datapoint model
+        directory (str): Root of the export, rows go under <directory>/<db table>/
+        after_id (int, optional):
+            Only export rows with a higher id, usually the previous watermark.
+        since (datetime.datetime, optional):
+            Only export rows newer than this.
+        export_format (str, optional):
+            Defaults to csv.
+            csv, which is gzip compressed, or parquet, which needs pyarrow.
+        chunk_size (int, optional):
+            Defaults to DEFAULT_EXPORT_CHUNK_SIZE.
+            Rows fetched per round trip and written per Parquet row group.
+
+    Returns:
+        dict: rows, files, and the watermark to pass as after_id next time
+    """
+    if export_format not in WRITERS:
+        raise ValueError(f"Unknown export format {export_format}, expected one of {EXPORT_FORMATS}")
+    watermark = committed_id_bound(model)
+    if watermark is None or (after_id is not None and watermark <= after_id):
+        LOGGER.info(f"No settled {model.__name__} rows to export after id {after_id}")
+        return dict(rows=0, files=[], watermark=after_id)
+
+    columns = export_columns(model)
+    queryset = model.objects.filter(id__lte=watermark)
+    if after_id is not None:
+        queryset = queryset.filter(id__gt=after_id)
+    if since is not None:
+        queryset = queryset.filter(timestamp__gt=since)
+    sql, params = queryset.order_by("spot_id", "timestamp", "id").values_list(*columns).query.sql_with_params()
+
+    part_name = f"part-{after_id or 0}-{watermark}"
+    export = PartitionedExport(model_directory(directory, model), columns, export_format, part_name)
+    try:
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                export.write(rows)
+        export.close()
+    except BaseException:
+        export.discard()
+        raise
+
+    # Renamed first, so an export killed in between repeats rows rather than losing them
+    export.commit()
+    write_watermark(directory, model, watermark)
+    LOGGER.info(f"Exported {export.rows} {model.__name__} rows into {len(export.files)} files up to id {watermark}")
+    return dict(rows=export.rows, files=export.files, watermark=watermark)
@@ -0,0 +1,204 @@
+"""
+Offline stand-ins for the network backends, for tests and load runs. Select them in settings:
+
+    SPOT_GEOCODER = "counter.fakes.FakeGeocoder"
+    SPOT_TIMEZONE_FINDER = "counter.fakes.FakeTimezoneFinder"
+    CAM_PROBER = "counter.fakes.FakeCamProber"
+
+or serve cams over real HTTP from a FakeCamServer and keep the default HttpCamProber.
+"""
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Places the tests and benchmarks use, everything else gets a stable made up location
+KNOWN_PLACES = {
+    ("San Clemente", "United States"): (33.3829, -117.5889),
+    ("Huntington Beach", "United States"): (33.6595, -117.9988),
+    ("Haleiwa", "United States"): (21.5928, -158.1034),
+    ("Ericeira", "Portugal"): (38.9629, -9.4176),
+}
+
+# (lat, lng, timezone) anchors, a location within ANCHOR_RADIUS degrees takes the nearest one's timezone
+TIMEZONE_ANCHORS = [
+    (33.5, -117.8, "America/Los_Angeles"),
+    (40.6, -73.8, "America/New_York"),
+    (21.5, -158.0, "Pacific/Honolulu"),
+    (38.8, -9.3, "Europe/Lisbon"),
+    (-33.9, 151.2, "Australia/Sydney"),
+    (35.3, 139.5, "Asia/Tokyo"),
+]
+ANCHOR_RADIUS = 10
+
+PLAYLIST = (
+    "#EXTM3U\n"
+    "#EXT-X-VERSION:3\n"
+    "#EXT-X-TARGETDURATION:6\n"
+    "#EXT-X-MEDIA-SEQUENCE:{sequence}\n"
+    "#EXTINF:6.0,\n"
+    "segment{sequence}.ts\n"
+)
+
+
+class FakeGeocoder:
+    """Geocode without the network. Places in unknown are not found, like a typo sent to Nominatim."""
+
+    def __init__(self, unknown=()):
+        self.unknown = set(unknown)
+        self.calls = 0
+
+    def geocode(self, city, country, postal_code):
+        """
+        Returns:
+            tuple[float, float] | None: The KNOWN_PLACES location, or one derived from a hash of the place
+        """
+        self.calls += 1
+        if city in self.unknown:
+            return None
+        if (city, country) in KNOWN_PLACES:
+            return KNOWN_PLACES[(city, country)]
+        digest = hashlib.sha256(f"{city}|{country}|{postal_code}".encode()).digest()
+        lat = int.from_bytes(digest[:4], "big") / 2 ** 32 * 120 - 60
+        lng = int.from_bytes(digest[4:8], "big") / 2 ** 32 * 360 - 180
+        return round(lat, 4), round(lng, 4)
+
+
+class FakeTimezoneFinder:
+    """
+    Resolve timezones without loading the timezonefinder polygons. Locations near a TIMEZONE_ANCHORS
+    entry get its real timezone, anything else the fixed offset Etc zone of its longitude.
+    """
+
+    def timezone_at(self, lng, lat):
+        nearest = min(TIMEZONE_ANCHORS, key=lambda anchor: (anchor[0] - lat) ** 2 + (anchor[1] - lng) ** 2)
+        if abs(nearest[0] - lat) <= ANCHOR_RADIUS and abs(nearest[1] - lng) <= ANCHOR_RADIUS:
+            return nearest[2]
+        offset = round(lng / 15)
+        # Etc zones are named with the inverted sign, Etc/GMT+8 is UTC-8
+        return "Etc/GMT" if offset == 0 else f"Etc/GMT{-offset:+d}"
+
+
+class FakeCamProber:
+    """
+    Answer cam probes in process. Every cam with a url is up unless the url is in down.
+    latency seconds are slept per probe to model slow cams, probed records every url checked.
+    """
+
+    def __init__(self, down=(), latency=0.0):
+        self.down = set(down)
+        self.latency = latency
+        self.probed = []
+        self._lock = threading.Lock()
+
+    def probe(self, url, session=None, timeout=None):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.probed.append(url)
+        return bool(url) and url not in self.down
+
+
+class FakeCamServer:
+    """
+    A local HTTP server of HLS cams at /<name>/playlist.m3u8, to exercise the real HttpCamProber offline.
+
+    Args:
+        latency (float, optional):
+            Defaults to 0.
+            Seconds every response is delayed.
+        failure_rate (float, optional):
+            Defaults to 0.
+            Fraction of requests answered with a 503, drawn from a seeded generator so runs repeat.
+        down (Iterable[str], optional):
+            Names of cams that always answer 503.
+        allow_head (bool, optional):
+            Defaults to True.
+            Answer HEAD with 405 when False, like some CDNs do.
+        seed (int, optional):
+            Defaults to 0.
+
+    Use as a context manager, or call start and stop.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, down=(), allow_head=True, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.down = set(down)
+        self.allow_head = allow_head
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def port(self):
+        return self._server.server_port
+
+    def url(self, name):
+        return f"http://127.0.0.1:{self.port}/{name}/playlist.m3u8"
+
+    def _fails(self, name):
+        with self._lock:
+            self.requests += 1
+            return name in self.down or self._random.random() < self.failure_rate
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, body):
+                if server.latency:
+                    time.sleep(server.latency)
+                name, _, filename = self.path.strip("/").partition("/")
+                if filename != "playlist.m3u8":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                if server._fails(name):
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                playlist = PLAYLIST.format(sequence=int(time.time() // 6)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/vnd.apple.mpegurl")
+                self.send_header("Content-Length", str(len(playlist)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(playlist)
+
+            def do_HEAD(self):
+                if not server.allow_head:
+                    self.send_response(405)
+                    self.end_headers()
+                    return
+                self._respond(body=False)
+
+            def do_GET(self):
+                self._respond(body=True)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,105 @@
+import logging
+
+from django.db import connection, transaction
+
+from .enums import SurfQualityRating
+from .metrics import instrument
+from .models import AverageDataPoint, CrowdForecast, RollupCheckpoint, SurfQualityDataPoint
+from .watermarks import committed_id_bound
+
+LOGGER = logging.getLogger(__name__)
+
+AVERAGE_CHECKPOINT = "crowd_forecast.average"
+RATING_CHECKPOINT = "crowd_forecast.rating"
+
+RATING_COLUMNS = {rating: f"rating_{rating.name.lower()}" for rating in SurfQualityRating}
+
+KEY_COLUMNS = "spot_id, month_id, day_id, hour_id"
+
+
+def _checkpoint(name):
+    checkpoint, _ = RollupCheckpoint.objects.select_for_update().get_or_create(name=name)
+    return checkpoint
+
+
+def _fold_averages(cursor, start, end):
+    table = CrowdForecast._meta.db_table
+    cursor.execute(
+        f"""
+        INSERT INTO {table} ({KEY_COLUMNS}, sample_count, count_sum, count_mean,
+            {", ".join(RATING_COLUMNS.values())})
+        SELECT {KEY_COLUMNS}, COUNT(*), SUM(count), AVG(count), {", ".join(["0"] * len(RATING_COLUMNS))}
+        FROM {AverageDataPoint._meta.db_table}
+        WHERE id > %s AND id <= %s AND hour_id IS NOT NULL
+        GROUP BY {KEY_COLUMNS}
+        ON CONFLICT ({KEY_COLUMNS}) DO UPDATE SET
+            sample_count = {table}.sample_count + EXCLUDED.sample_count,
+            count_sum = {table}.count_sum + EXCLUDED.count_sum,
+            count_mean = ({table}.count_sum + EXCLUDED.count_sum)::float
+                / ({table}.sample_count + EXCLUDED.sample_count)
+        """,
+        [start, end],
+    )
+
+
+def _fold_ratings(cursor, start, end):
+    table = CrowdForecast._meta.db_table
+    sums = ", ".join(
+        "SUM(CASE WHEN rating = %s THEN 1 ELSE 0 END)" for _ in RATING_COLUMNS
+    )
+    updates = ",\n".join(f"{column} = {table}.{column} + EXCLUDED.{column}" for column in RATING_COLUMNS.values())
+    cursor.execute(
+        f"""
+        INSERT INTO {table} ({KEY_COLUMNS}, sample_count, count_sum, count_mean,
+            {", ".join(RATING_COLUMNS.values())})
+        SELECT {KEY_COLUMNS}, 0, 0, NULL, {sums}
+        FROM {SurfQualityDataPoint._meta.db_table}
+        WHERE id > %s AND id <= %s AND hour_id IS NOT NULL
+        GROUP BY {KEY_COLUMNS}
+        ON CONFLICT ({KEY_COLUMNS}) DO UPDATE SET
+            {updates}
+        """,
+        [rating.value for rating in RATING_COLUMNS] + [start, end],
+    )
+
+
+@instrument("rollup.refresh_crowd_forecasts")
+def refresh_crowd_forecasts(full=False):
+    """
+    Fold the AverageDataPoints and SurfQualityDataPoints added since the last refresh into CrowdForecast,
+    one grouped upsert per source table. Checkpoints are locked for the run, so concurrent refreshes
+    can't count a row twice, and only advance to counter.watermarks.committed_id_bound, so rows whose
+    transaction commits after a higher id was folded in are not skipped.
+
+    Args:
+        full (bool, optional):
+            Defaults to False.
+            Drop every forecast and rebuild from the full history.
+
+    Returns:
+        dict[str, tuple[int, int]]: The (start, end] id range folded in per checkpoint
+    """
+    folds = [
+        (AVERAGE_CHECKPOINT, AverageDataPoint, _fold_averages),
+        (RATING_CHECKPOINT, SurfQualityDataPoint, _fold_ratings),
+    ]
+    # Read before the checkpoints are locked, waiting for writers can take up to the settle timeout
+    bounds = {name: committed_id_bound(model) for name, model, _ in folds}
+    processed = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        checkpoints = {name: _checkpoint(name) for name, _, _ in folds}
+        if full:
+            CrowdForecast.objects.all().delete()
+            for checkpoint in checkpoints.values():
+                checkpoint.position = 0
+
+        for name, _, fold in folds:
+            checkpoint = checkpoints[name]
+            end = bounds[name]
+            if end is not None and end > checkpoint.position:
+                fold(cursor, checkpoint.position, end)
+                processed[name] = (checkpoint.position, end)
+                checkpoint.position = end
+            checkpoint.save()
+    LOGGER.info(f"Refreshed crowd forecasts: {processed}")
+    return processed
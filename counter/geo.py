@@ -0,0 +1,170 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SPOT_GEOCODER = "counter.geo.NominatimGeocoder"
+DEFAULT_SPOT_TIMEZONE_FINDER = "timezonefinder.TimezoneFinder"
+
+_lock = threading.Lock()
+_timezone_finder = None
+_geocoder = None
+
+
+class NominatimGeocoder:
+    """Geocode with OpenStreetMap Nominatim. Any class with the same geocode method can be set as SPOT_GEOCODER."""
+
+    def __init__(self, user_agent="SurfSight"):
+        from geopy.geocoders import Nominatim
+
+        self.geolocator = Nominatim(user_agent=user_agent)
+
+    def geocode(self, city, country, postal_code):
+        """
+        Returns:
+            tuple[float, float] | None: lat and lng, or None if the place wasn't found
+        """
+        location = self.geolocator.geocode(
+            {"city": city, "country": country, "postal_code": postal_code}
+        )
+        if location is None:
+            return None
+        return location.latitude, location.longitude
+
+
+def get_geocoder():
+    """The SPOT_GEOCODER instance, created once per process"""
+    global _geocoder
+    if _geocoder is None:
+        with _lock:
+            if _geocoder is None:
+                _geocoder = import_string(getattr(settings, "SPOT_GEOCODER", DEFAULT_SPOT_GEOCODER))()
+    return _geocoder
+
+
+def get_timezone_finder():
+    """
+    The SPOT_TIMEZONE_FINDER instance, any class with a timezone_at(lng, lat) method.
+    TimezoneFinder loads its polygon data on construction, so one instance is shared per process.
+    """
+    global _timezone_finder
+    if _timezone_finder is None:
+        with _lock:
+            if _timezone_finder is None:
+                _timezone_finder = import_string(
+                    getattr(settings, "SPOT_TIMEZONE_FINDER", DEFAULT_SPOT_TIMEZONE_FINDER)
+                )()
+    return _timezone_finder
+
+
+@receiver(setting_changed, dispatch_uid="reset_geo_backends")
+def reset_backends(setting, **kwargs):
+    """Drop the cached backends when override_settings swaps them"""
+    global _geocoder, _timezone_finder
+    if setting == "SPOT_GEOCODER":
+        _geocoder = None
+    elif setting == "SPOT_TIMEZONE_FINDER":
+        _timezone_finder = None
+
+
+def timezone_at(lat, lng):
+    return get_timezone_finder().timezone_at(lng=lng, lat=lat)
+
+
+def geocode(city, country, postal_code):
+    """
+    Geocode a place, reading and filling the persistent GeocodedLocation cache.
+
+    Returns:
+        tuple[float, float] | None: lat and lng, or None if the place wasn't found
+    """
+    from .models import GeocodedLocation
+
+    key = dict(city=city, country=country, postal_code=str(postal_code))
+    cached = GeocodedLocation.objects.filter(**key).values_list("lat", "lng").first()
+    if cached:
+        return cached
+
+    location = get_geocoder().geocode(city, country, postal_code)
+    if location is not None:
+        GeocodedLocation.objects.bulk_create(
+            [GeocodedLocation(lat=location[0], lng=location[1], **key)], ignore_conflicts=True
+        )
+    return location
+
+
+def geocode_many(places):
+    """
+    Geocode many places, reading every cached one with a single query and caching the new ones with another.
+
+    Args:
+        places (Iterable[tuple[str, str, str]]): (city, country, postal_code) keys
+
+    Returns:
+        dict[tuple, tuple[float, float] | None]: lat and lng by place, None if it wasn't found
+    """
+    from .models import GeocodedLocation
+
+    places = {(city, country, str(postal_code)) for city, country, postal_code in places}
+    if not places:
+        return {}
+    cities = {city for city, _, _ in places}
+    found = {
+        (city, country, postal_code): (lat, lng)
+        for city, country, postal_code, lat, lng in GeocodedLocation.objects.filter(city__in=cities).values_list(
+            "city", "country", "postal_code", "lat", "lng"
+        )
+        if (city, country, postal_code) in places
+    }
+    new = []
+    geocoder = get_geocoder()
+    for place in places.difference(found):
+        try:
+            location = geocoder.geocode(*place)
+        except Exception as e:
+            LOGGER.error(f"ERROR geocoding {place}: {e}")
+            location = None
+        found[place] = location
+        if location is not None:
+            city, country, postal_code = place
+            new.append(
+                GeocodedLocation(city=city, country=country, postal_code=postal_code, lat=location[0], lng=location[1])
+            )
+    GeocodedLocation.objects.bulk_create(new, ignore_conflicts=True)
+    return found
+
+
+def timezones_at(locations):
+    """
+    Resolve many timezones, looking up each distinct location once.
+
+    Args:
+        locations (Iterable[tuple[float, float]]): (lat, lng) pairs
+
+    Returns:
+        dict[tuple[float, float], str | None]: Timezone name by location, None offshore or otherwise unknown
+    """
+    finder = get_timezone_finder()
+    return {(lat, lng): finder.timezone_at(lng=lng, lat=lat) for lat, lng in set(locations)}
+
+
+def enrich_spot(spot):
+    """
+    Set the lat, lng and timezone of a spot from its city, country and postal code and save only those fields.
+
+    Returns:
+        Spot: The spot, unchanged if its location couldn't be found
+    """
+    location = geocode(spot.major_city, spot.country, spot.postal_code)
+    if location is None:
+        LOGGER.error(f"ERROR geocoding spot {spot.pk}: no location for {spot.major_city}, {spot.country}")
+        return spot
+    spot.lat, spot.lng = location
+    spot.timezone = timezone_at(spot.lat, spot.lng)
+    spot.save(update_fields=["lat", "lng", "timezone"])
+    return spot
@@ -0,0 +1,156 @@
+import logging
+import threading
+import time
+
+from django.db import connection
+from django.utils import timezone
+
+from .metrics import instrument
+from .models import DetectionDataPoint
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Shortest sleep of the background flusher, so a max_age of 0 doesn't spin
+MIN_FLUSH_WAIT = 0.1
+
+
+def _spot_id(spot):
+    """Accept either a Spot instance or its primary key."""
+    return getattr(spot, "pk", spot)
+
+
+@instrument("ingest.detections")
+def ingest_detections(points, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Write many DetectionDataPoints, from any number of spots, in as few INSERTs as possible.
+
+    Args:
+        points (Iterable[tuple]): (spot, timestamp, count) tuples. spot may be a Spot or a spot id,
+            a timestamp of None is stamped with the current time.
+        batch_size (int, optional):
+            Defaults to DEFAULT_BATCH_SIZE.
+            Maximum rows per INSERT statement.
+
+    Returns:
+        list[DetectionDataPoint]: The created datapoints
+    """
+    now = timezone.now()
+    objs = [
+        DetectionDataPoint(spot_id=_spot_id(spot), timestamp=timestamp or now, count=count)
+        for spot, timestamp, count in points
+    ]
+    if not objs:
+        return []
+    return DetectionDataPoint.objects.bulk_create(objs, batch_size=batch_size)
+
+
+class DetectionBuffer:
+    """
+    Collect detections in memory and write them with ingest_detections once the buffer
+    holds max_size points or its oldest point is older than max_age seconds.
+
+    add only checks the age of the buffer when a point arrives, so points added before the
+    detections stop would wait for the next one. Call start to flush stale points from a
+    background thread, or call flush periodically yourself. Either way call close, or use
+    the buffer as a context manager, on shutdown: points still buffered when the process
+    dies are lost.
+
+    Points are stamped when added but written up to max_age later, after the rollup of their
+    window may have run. counter.scheduler.run_shard reads such late rows along with the next window.
+
+    Safe to share between threads.
+    """
+
+    def __init__(self, max_size=500, max_age=10.0, batch_size=DEFAULT_BATCH_SIZE):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self._points = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._points)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self):
+        """Flush from a daemon thread whenever the oldest point reaches max_age, until close"""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="detection-buffer-flusher", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        """Stop the background flusher, if started, and write everything still buffered"""
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+        return self.flush()
+
+    def _wait(self):
+        with self._lock:
+            oldest = self._oldest
+        remaining = self.max_age if oldest is None else self.max_age - (time.monotonic() - oldest)
+        return max(remaining, MIN_FLUSH_WAIT)
+
+    def _run(self):
+        try:
+            while not self._stopped.wait(self._wait()):
+                if not self.is_due():
+                    continue
+                try:
+                    self.flush()
+                except Exception:
+                    # Logged by flush and the points are kept, retry after a full max_age
+                    self._stopped.wait(self.max_age)
+        finally:
+            # The thread's own database connection
+            connection.close()
+
+    def add(self, spot, count, timestamp=None):
+        """
+        Buffer a single detection, flushing if the buffer is full or stale.
+
+        Returns:
+            list[DetectionDataPoint]: The datapoints written by a triggered flush, otherwise empty
+        """
+        with self._lock:
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._points.append((spot, timestamp or timezone.now(), count))
+        if self.is_due():
+            return self.flush()
+        return []
+
+    def is_due(self):
+        with self._lock:
+            if not self._points:
+                return False
+            return len(self._points) >= self.max_size or time.monotonic() - self._oldest >= self.max_age
+
+    def flush(self):
+        """Write every buffered detection. On failure the points are put back for the next flush."""
+        with self._lock:
+            points, self._points = self._points, []
+            oldest, self._oldest = self._oldest, None
+        if not points:
+            return []
+        try:
+            return ingest_detections(points, batch_size=self.batch_size)
+        except Exception as e:
+            LOGGER.error(f"ERROR flushing {len(points)} detections: {e}")
+            with self._lock:
+                self._points[:0] = points
+                self._oldest = oldest
+            raise
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from counter.export import DEFAULT_EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_datapoints, read_watermark
+from counter.models import AggregateDataPoint, AverageDataPoint, DetectionDataPoint, SurfQualityDataPoint
+
+MODELS = {
+    model.__name__: model for model in (DetectionDataPoint, AggregateDataPoint, AverageDataPoint, SurfQualityDataPoint)
+}
+
+
+class Command(BaseCommand):
+    help = "Export datapoint history into gzipped CSV or Parquet files partitioned by spot and day"
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", choices=sorted(MODELS))
+        parser.add_argument("directory")
+        parser.add_argument("--format", dest="export_format", choices=EXPORT_FORMATS, default="csv")
+        parser.add_argument("--since", help="Only export rows newer than this ISO timestamp")
+        parser.add_argument("--incremental", action="store_true", help="Continue from the last export's watermark")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, model, directory, export_format, since, incremental, chunk_size, **options):
+        model = MODELS[model]
+        if since:
+            since = parse_datetime(since)
+            if since is None:
+                raise CommandError("--since must be an ISO timestamp")
+        after_id = read_watermark(directory, model) if incremental else None
+
+        result = export_datapoints(
+            model, directory, after_id=after_id, since=since, export_format=export_format, chunk_size=chunk_size
+        )
+        self.stdout.write(f"{result['rows']} rows in {len(result['files'])} files, watermark id {result['watermark']}")
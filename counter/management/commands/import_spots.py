@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from counter.spot_import import DEFAULT_IMPORT_BATCH_SIZE, import_spots, read_spot_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk import spots from a CSV, JSON or JSON lines file with name, major_city, country, postal_code and url"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_IMPORT_BATCH_SIZE)
+        parser.add_argument("--processes", type=int, default=None, help="Sun time worker processes")
+
+    def handle(self, *args, path, batch_size, processes, **options):
+        report = import_spots(read_spot_rows(path), batch_size=batch_size, processes=processes)
+
+        for number, reason in report.failures:
+            self.stderr.write(f"row {number}: {reason}")
+        self.stdout.write(
+            f"{report.rows} rows, {report.created} created, {report.duplicates} duplicates, "
+            f"{len(report.failures)} failed in {report.elapsed:.1f}s ({report.rows_per_second:.0f} rows/s)"
+        )
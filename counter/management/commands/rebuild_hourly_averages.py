@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from counter.models import Spot
+
+
+class Command(BaseCommand):
+    help = (
+        "Repair the HourlyAverageDataPoints by recalculating them from the full AverageDataPoint history. "
+        "New AverageDataPoints already keep them current, so this is only needed after editing the history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("spots", nargs="*", type=int, help="Spot ids, defaults to every spot")
+
+    def handle(self, *args, spots, **options):
+        queryset = Spot.objects.filter(pk__in=spots) if spots else Spot.objects.all()
+        queryset.rebuild_hourly_averages()
+        self.stdout.write(f"Rebuilt the hourly averages of {queryset.count()} spots")
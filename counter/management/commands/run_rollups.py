@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from counter.scheduler import ROLLUP_TASKS, rollup_shards, run_rollups, run_shard
+
+
+class Command(BaseCommand):
+    help = "Run the rollup cycle sharded by spot across worker processes, or a single shard"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shards", type=int, default=None, help="Defaults to ROLLUP_SHARDS")
+        parser.add_argument("--processes", type=int, default=None, help="Defaults to one per shard")
+        parser.add_argument("--shard", type=int, default=None, help="Only run this shard, e.g. from a mapped task")
+        parser.add_argument("--tasks", default=None, help=f"Comma separated subset of {', '.join(ROLLUP_TASKS)}")
+
+    def handle(self, *args, shards, processes, shard, tasks, **options):
+        shards = shards or rollup_shards()
+        if tasks:
+            tasks = tasks.split(",")
+            unknown = set(tasks).difference(ROLLUP_TASKS)
+            if unknown:
+                raise CommandError(f"Unknown rollup tasks: {', '.join(sorted(unknown))}")
+
+        if shard is not None:
+            if not 0 <= shard < shards:
+                raise CommandError(f"--shard must be in range({shards})")
+            results = {shard: run_shard(shard, shards, tasks)}
+        else:
+            results = run_rollups(shards, processes, tasks)
+
+        for number, result in sorted(results.items()):
+            self.stdout.write(f"shard {number}: " + ", ".join(f"{task} {status}" for task, status in result.items()))
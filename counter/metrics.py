@@ -0,0 +1,232 @@
+"""
+Hot path instrumentation. Functions wrapped with instrument report the latency, query count and
+rows touched of every call to the sinks listed in METRICS_SINKS:
+
+    METRICS_SINKS = ["counter.metrics.LogSink", "counter.metrics.StatsdSink", "counter.metrics.PrometheusSink"]
+
+With no sinks configured, the default, an instrumented call costs one global lookup and a branch.
+"""
+import bisect
+import functools
+import logging
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_STATSD_ADDRESS = ("127.0.0.1", 8125)
+DEFAULT_METRICS_PREFIX = "surfsight"
+DEFAULT_PROMETHEUS_INTERVAL = 15
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_UNRESOLVED = object()
+_lock = threading.Lock()
+_sinks = _UNRESOLVED
+
+
+def metrics_prefix():
+    return getattr(settings, "METRICS_PREFIX", DEFAULT_METRICS_PREFIX)
+
+
+class LogSink:
+    """Log one line per call"""
+
+    def record(self, name, seconds, queries, rows):
+        LOGGER.info(f"{name} took {seconds * 1000:.1f}ms, {queries} queries, {rows} rows")
+
+
+class StatsdSink:
+    """
+    Send each call as StatsD timing and histogram packets over UDP to METRICS_STATSD_ADDRESS.
+    UDP is fire and forget, so a missing agent never slows the caller down.
+    """
+
+    def __init__(self, address=None):
+        self.address = tuple(address or getattr(settings, "METRICS_STATSD_ADDRESS", DEFAULT_STATSD_ADDRESS))
+        self.prefix = metrics_prefix()
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+    def record(self, name, seconds, queries, rows):
+        metric = f"{self.prefix}.{name}"
+        packet = f"{metric}.latency:{seconds * 1000:.3f}|ms\n{metric}.queries:{queries}|h\n{metric}.rows:{rows}|h"
+        try:
+            self.socket.sendto(packet.encode(), self.address)
+        except OSError as e:
+            LOGGER.debug(f"Dropped StatsD metric {metric}: {e}")
+
+
+class Histogram:
+    """Cumulative latency histogram plus query and row totals of one instrumented name"""
+
+    __slots__ = ("buckets", "count", "seconds", "queries", "rows")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+
+    def observe(self, seconds, queries, rows):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.seconds += seconds
+        self.queries += queries
+        self.rows += rows
+
+
+class PrometheusSink:
+    """
+    Aggregate calls into histograms rendered in the Prometheus text format. With METRICS_PROMETHEUS_PATH
+    set, a daemon thread also writes the text there every METRICS_PROMETHEUS_INTERVAL seconds, for the
+    node_exporter textfile collector, so recording a call never waits on the file.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or getattr(settings, "METRICS_PROMETHEUS_PATH", None)
+        self.interval = getattr(settings, "METRICS_PROMETHEUS_INTERVAL", DEFAULT_PROMETHEUS_INTERVAL)
+        self.prefix = metrics_prefix()
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        if self.path:
+            self._thread = threading.Thread(target=self._run, name="prometheus-dumper", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.dump()
+            except OSError as e:
+                LOGGER.error(f"ERROR writing metrics to {self.path}: {e}")
+
+    def close(self):
+        """Stop the background writer, if started, and write the metrics one last time"""
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+            self.dump()
+
+    def record(self, name, seconds, queries, rows):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds, queries, rows)
+
+    def render(self):
+        """
+        Returns:
+            str: Every histogram in the Prometheus text exposition format
+        """
+        metric = f"{self.prefix}_call"
+        lines = [
+            f"# TYPE {metric}_seconds histogram",
+            f"# TYPE {metric}_queries_total counter",
+            f"# TYPE {metric}_rows_total counter",
+        ]
+        with self._lock:
+            for name, histogram in sorted(self.histograms.items()):
+                label = f'name="{name}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), histogram.buckets):
+                    cumulative += count
+                    lines.append(f'{metric}_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f"{metric}_seconds_sum{{{label}}} {histogram.seconds}")
+                lines.append(f"{metric}_seconds_count{{{label}}} {histogram.count}")
+                lines.append(f"{metric}_queries_total{{{label}}} {histogram.queries}")
+                lines.append(f"{metric}_rows_total{{{label}}} {histogram.rows}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path=None):
+        """Atomically write the rendered metrics to path, defaults to METRICS_PROMETHEUS_PATH"""
+        path = path or self.path
+        with open(f"{path}.tmp", "w") as f:
+            f.write(self.render())
+        os.replace(f"{path}.tmp", path)
+
+
+def get_sinks():
+    """The METRICS_SINKS instances, created once per process. Empty when metrics are disabled."""
+    global _sinks
+    if _sinks is _UNRESOLVED:
+        with _lock:
+            if _sinks is _UNRESOLVED:
+                _sinks = [import_string(path)() for path in getattr(settings, "METRICS_SINKS", [])]
+    return _sinks
+
+
+@receiver(setting_changed, dispatch_uid="reset_metrics_sinks")
+def reset_sinks(setting, **kwargs):
+    global _sinks
+    if setting in ("METRICS_SINKS", "METRICS_PREFIX"):
+        with _lock:
+            sinks, _sinks = _sinks, _UNRESOLVED
+        if sinks is not _UNRESOLVED:
+            for sink in sinks:
+                if hasattr(sink, "close"):
+                    sink.close()
+
+
+class _QueryCounter:
+    """Database execute wrapper counting the statements run and the rows they returned or changed"""
+
+    __slots__ = ("queries", "rows")
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        self.queries += 1
+        rowcount = getattr(context["cursor"], "rowcount", -1)
+        if rowcount > 0:
+            self.rows += rowcount
+        return result
+
+
+def _record(sinks, name, seconds, counter):
+    for sink in sinks:
+        try:
+            sink.record(name, seconds, counter.queries, counter.rows)
+        except Exception as e:
+            LOGGER.error(f"ERROR recording metric {name} in {type(sink).__name__}: {e}")
+
+
+def instrument(name):
+    """
+    Decorate a function or method to record every call as name. Nested instrumented calls are
+    recorded on their own and also counted in their callers.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            sinks = _sinks if _sinks is not _UNRESOLVED else get_sinks()
+            if not sinks:
+                return fn(*args, **kwargs)
+            counter = _QueryCounter()
+            start = time.perf_counter()
+            try:
+                with connection.execute_wrapper(counter):
+                    return fn(*args, **kwargs)
+            finally:
+                _record(sinks, name, time.perf_counter() - start, counter)
+
+        return wrapper
+
+    return decorator
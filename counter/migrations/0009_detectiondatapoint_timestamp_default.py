@@ -0,0 +1,19 @@
+# Generated by Django 3.2.14 on 2026-10-17 14:50
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('counter', '0008_surf_quality'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='detectiondatapoint',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
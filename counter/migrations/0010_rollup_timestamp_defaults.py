@@ -0,0 +1,24 @@
+# Generated by Django 3.2.14 on 2026-10-17 14:51
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('counter', '0009_detectiondatapoint_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='aggregatedatapoint',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='averagedatapoint',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.14 on 2026-10-17 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('counter', '0011_surfqualitydatapoint_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hourlyaveragedatapoint',
+            name='count_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='hourlyaveragedatapoint',
+            name='sample_count',
+            field=models.IntegerField(default=0),
+        ),
+        # Collapse duplicate buckets and seed the running totals from the existing history
+        migrations.RunSQL(
+            sql="""
+            DELETE FROM counter_hourlyaveragedatapoint a
+            USING counter_hourlyaveragedatapoint b
+            WHERE a.spot_id = b.spot_id AND a.hour_id = b.hour_id AND a.id > b.id;
+
+            UPDATE counter_hourlyaveragedatapoint h
+            SET count_sum = totals.count_sum,
+                sample_count = totals.sample_count,
+                count = totals.count_sum / totals.sample_count
+            FROM (
+                SELECT spot_id, hour_id, SUM(count) AS count_sum, COUNT(*) AS sample_count
+                FROM counter_averagedatapoint
+                WHERE hour_id IS NOT NULL
+                GROUP BY spot_id, hour_id
+            ) totals
+            WHERE h.spot_id = totals.spot_id AND h.hour_id = totals.hour_id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='hourlyaveragedatapoint',
+            constraint=models.UniqueConstraint(fields=('spot', 'hour_id'), name='unique_spot_hour_average'),
+        ),
+    ]
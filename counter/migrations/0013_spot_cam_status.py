@@ -0,0 +1,28 @@
+# Generated by Django 3.2.14 on 2026-10-17 14:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('counter', '0012_hourly_average_running_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spot',
+            name='cam_checked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='spot',
+            name='cam_failures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='spot',
+            name='cam_next_check_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.14 on 2026-10-17 14:55
+
+import datetime
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def seed_sun_windows(apps, schema_editor):
+    """Fill a week of windows so active() keeps working until the daily job runs"""
+    from counter.solar import local_date, sun_times
+
+    Spot = apps.get_model("counter", "Spot")
+    SunWindow = apps.get_model("counter", "SunWindow")
+    windows = []
+    for spot in Spot.objects.filter(lat__isnull=False, lng__isnull=False, timezone__isnull=False):
+        start = local_date(spot.timezone)
+        for offset in range(7):
+            date = start + datetime.timedelta(days=offset)
+            times = sun_times(spot.lat, spot.lng, date, spot.timezone)
+            # Polar night dates get no window, like counter.solar.save_sun_windows
+            if times is not None:
+                windows.append(SunWindow(spot_id=spot.pk, date=date, sunrise=times[0], sunset=times[1]))
+    SunWindow.objects.bulk_create(windows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('counter', '0013_spot_cam_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SunWindow',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('sunrise', models.DateTimeField()),
+                ('sunset', models.DateTimeField()),
+                ('spot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='counter.spot')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='sunwindow',
+            index=models.Index(fields=['sunset', 'sunrise'], name='sun_window_range_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='sunwindow',
+            constraint=models.UniqueConstraint(fields=('spot', 'date'), name='unique_spot_sun_window'),
+        ),
+        migrations.RunPython(seed_sun_windows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 3.2.14 on 2026-10-17 14:55
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently so the datapoint tables stay writable
+    atomic = False
+
+    dependencies = [
+        ('counter', '0014_sun_window'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='aggregatedatapoint',
+            index=models.Index(fields=['spot', '-timestamp'], name='aggregate_spot_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='aggregatedatapoint',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['timestamp'], name='aggregate_ts_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='averagedatapoint',
+            index=models.Index(fields=['spot', '-timestamp'], name='average_spot_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='averagedatapoint',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['timestamp'], name='average_ts_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='detectiondatapoint',
+            index=models.Index(fields=['spot', '-timestamp'], name='detection_spot_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='detectiondatapoint',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['timestamp'], name='detection_ts_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='surfqualitydatapoint',
+            index=models.Index(fields=['spot', '-timestamp'], name='surfquality_spot_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='surfqualitydatapoint',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['timestamp'], name='surfquality_ts_brin'),
+        ),
+        # The (spot, timestamp) indexes cover spot lookups, drop the now redundant FK indexes
+        migrations.AlterField(
+            model_name='aggregatedatapoint',
+            name='spot',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='counter.spot'),
+        ),
+        migrations.AlterField(
+            model_name='averagedatapoint',
+            name='spot',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='counter.spot'),
+        ),
+        migrations.AlterField(
+            model_name='detectiondatapoint',
+            name='spot',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='counter.spot'),
+        ),
+        migrations.AlterField(
+            model_name='surfqualitydatapoint',
+            name='spot',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='counter.spot'),
+        ),
+    ]
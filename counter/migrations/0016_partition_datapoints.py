@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from counter.partitions import PARTITIONED_TABLES, partition_table, unpartition_table
+
+
+def partition(name):
+    return lambda apps, schema_editor: partition_table(name)
+
+
+def unpartition(name):
+    return lambda apps, schema_editor: unpartition_table(name)
+
+
+class Migration(migrations.Migration):
+    # The primary key index is built concurrently and the archive bound validated outside the swap transaction,
+    # so the datapoint tables stay writable, see counter.partitions.partition_table
+    atomic = False
+
+    dependencies = [
+        ("counter", "0015_datapoint_time_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition(name), reverse_code=unpartition(name)) for name in PARTITIONED_TABLES
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.14 on 2026-10-17 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('counter', '0016_partition_datapoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodedLocation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('country', models.CharField(max_length=100)),
+                ('postal_code', models.CharField(max_length=10)),
+                ('lat', models.FloatField()),
+                ('lng', models.FloatField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='geocodedlocation',
+            constraint=models.UniqueConstraint(fields=('city', 'country', 'postal_code'), name='unique_geocoded_location'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.14 on 2026-10-17 15:01
+
+import counter.enums
+from django.db import migrations, models
+import django.db.models.deletion
+import enumfields.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('counter', '0017_geocoded_location'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('position', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CrowdForecast',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month_id', enumfields.fields.EnumIntegerField(enum=counter.enums.MonthIdentifierEnum)),
+                ('day_id', enumfields.fields.EnumIntegerField(enum=counter.enums.DayIdentifierEnum)),
+                ('hour_id', enumfields.fields.EnumIntegerField(enum=counter.enums.HourIdentifierEnum)),
+                ('sample_count', models.IntegerField(default=0)),
+                ('count_sum', models.BigIntegerField(default=0)),
+                ('count_mean', models.FloatField(null=True)),
+                ('rating_poor', models.IntegerField(default=0)),
+                ('rating_poor_to_fair', models.IntegerField(default=0)),
+                ('rating_fair', models.IntegerField(default=0)),
+                ('rating_fair_to_good', models.IntegerField(default=0)),
+                ('rating_good', models.IntegerField(default=0)),
+                ('spot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='counter.spot')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='crowdforecast',
+            constraint=models.UniqueConstraint(fields=('spot', 'month_id', 'day_id', 'hour_id'), name='unique_spot_crowd_forecast'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.14 on 2026-10-17 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('counter', '0018_crowd_forecast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spot',
+            name='current_count_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='spot',
+            name='current_surf_quality_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
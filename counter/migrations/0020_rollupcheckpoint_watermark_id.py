@@ -0,0 +1,18 @@
+# Generated by Django 3.2.14 on 2026-10-17 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('counter', '0019_spot_current_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rollupcheckpoint',
+            name='watermark_id',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.14 on 2026-10-17 15:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('counter', '0020_rollupcheckpoint_watermark_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rollupcheckpoint',
+            name='watermark',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
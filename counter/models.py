@@ -1,71 +1,406 @@
 import datetime
 import logging
-from statistics import mean
 
 import pytz
-import requests
-from astral import LocationInfo, sun
 from django.conf import settings
-from django.db import models
-from django.db.models import Avg, F, Func, Q
-from django.db.models.fields import DateTimeField
-from django.db.models.signals import post_save
+from django.contrib.postgres.indexes import BrinIndex
+from django.db import connection, models, transaction
+from django.db.models import Avg, Exists, Func, IntegerField, Max, OuterRef, Q, Subquery
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 from enumfields import EnumIntegerField, EnumField
-from geopy.geocoders import Nominatim
-from timezonefinder import TimezoneFinder
-from multiprocessing.dummy import Pool as ThreadPool
-from multiprocessing import cpu_count
 
+from .cache import spot_cache
+from .cams import CAM_STATUS_FIELDS, check_cams, get_cam_prober, record_cam_status
+from .solar import NEW_SPOT_SUN_WINDOW_DAYS, SUN_FIELDS, precompute_sun_times, save_sun_windows, set_sun_times
+from .geo import enrich_spot
+from .metrics import instrument
 from .enums import DayIdentifierEnum, HourIdentifierEnum, MonthIdentifierEnum, SurfQualityRating
 
 LOGGER = logging.getLogger(__name__)
 
 
-class ConvertToTimezone(Func):
+def _window(minutes, start=None, end=None):
+    """The [start, end) window of a rollup, defaulting to the last interval of minutes up to now"""
+    end = end or timezone.now()
+    return start or end - datetime.timedelta(minutes=int(minutes)), end
+
+
+def _window_rows(model, spots, start, end, after_id=None, until_id=None):
+    """
+    The datapoints a rollup of the [start, end) window reads. With until_id, only rows up to it are read.
+    With after_id as well, so are the rows of earlier windows with ids in (after_id, until_id]: they arrived
+    after those windows were rolled up, e.g. from a DetectionBuffer, so they are counted in this one rather than never.
     """
-    Construct sql clause to annotate localized times of each spot onto the queryset.
-    Times are stored as UTC in the database, comparing them to calculate whether a spot
-    is active yield inaccurate resuts. So we need the localized sunrise, current time, and sunset times.
+    window = Q(timestamp__gte=start, timestamp__lt=end)
+    if until_id is not None:
+        window &= Q(id__lte=until_id)
+        if after_id is not None:
+            window |= Q(timestamp__lt=start, id__gt=after_id, id__lte=until_id)
+    return model.objects.filter(window, spot__in=spots)
+
+
+def localize_time_info(instance, tz=None):
+    """Set the hour_id, day_id, and month_id of a datapoint from its timestamp in the spot timezone"""
+    tz = tz or spot_cache.timezone(instance.spot_id)
+    if tz is None or instance.timestamp is None:
+        return instance
+    local_time = instance.timestamp.astimezone(tz)
+    instance.hour_id = HourIdentifierEnum(local_time.hour)
+    instance.day_id = DayIdentifierEnum(local_time.weekday())
+    instance.month_id = MonthIdentifierEnum(local_time.month)
+    return instance
+
+
+def datapoint_indexes(prefix):
     """
+    Indexes shared by the datapoint tables: (spot, timestamp DESC) for per spot time range reads
+    and a BRIN on the append-only timestamp for cross spot time range scans.
+    """
+    return [
+        models.Index(fields=["spot", "-timestamp"], name=f"{prefix}_spot_ts_idx"),
+        BrinIndex(fields=["timestamp"], name=f"{prefix}_ts_brin"),
+    ]
+
 
-    output_field = DateTimeField()
+class DataPointQuerySet(models.QuerySet):
+    """Time range reads shaped to hit the datapoint_indexes"""
 
-    def __init__(self, timezone_field, datetime_field=None, now=False, **extra):
-        if now:
-            expressions = datetime.datetime.now().astimezone(pytz.utc), timezone_field
+    def for_spot_since(self, spot, since):
+        """Datapoints of one spot newer than since, newest first"""
+        return self.filter(spot=spot, timestamp__gt=since).order_by("-timestamp")
+
+    def latest_for_spots(self, spots=None):
+        """
+        The newest datapoint of each spot. Postgres has no skip scan, so rather than DISTINCT ON walking
+        the whole (spot, timestamp DESC) index, each spot's newest id is a correlated LIMIT 1 lookup on it.
+
+        Args:
+            spots (Iterable[Spot] | Queryset[Spot], optional):
+                Defaults to every spot with datapoints.
+        """
+        newest = self.filter(spot=OuterRef("pk")).order_by("-timestamp").values("pk")[:1]
+        if spots is None:
+            candidates = Spot.objects.all()
+        elif isinstance(spots, models.QuerySet):
+            candidates = spots
         else:
-            expressions = datetime_field, timezone_field
-
-        super(ConvertToTimezone, self).__init__(*expressions, **extra)
-
-    def as_sql(
-        self,
-        compiler,
-        connection,
-        fn=None,
-        template=None,
-        arg_joiner=None,
-        **extra_context,
-    ):
-        params = []
-        sql_parts = []
-        for arg in self.source_expressions:
-            arg_sql, arg_params = compiler.compile(arg)
-            sql_parts.append(arg_sql)
-            params.extend(arg_params)
-
-        return "%s AT TIME ZONE %s" % tuple(sql_parts), params
-
-
-class SpotManager(models.Manager):
+            candidates = Spot.objects.filter(pk__in=[spot.pk for spot in spots])
+        return self.filter(pk__in=candidates.annotate(newest=Subquery(newest)).values("newest"))
+
+
+class TimeInfoQuerySet(DataPointQuerySet):
+    """QuerySet for datapoints carrying local hour_id, day_id, and month_id"""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create skips the pre_save signal, so the time info is set here
+        objs = list(objs)
+        spot_cache.prime({obj.spot_id for obj in objs})
+        for obj in objs:
+            if obj.hour_id is None:
+                localize_time_info(obj)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+@instrument("rollup.add_to_hourly_averages")
+def add_to_hourly_averages(points):
+    """
+    Fold new AverageDataPoints into their HourlyAverageDataPoint buckets with a single upsert.
+    Each bucket keeps a running sum and sample count, so the cost only depends on the new points.
+
+    Args:
+        points (Iterable[AverageDataPoint]): Saved points with their hour_id set
+    """
+    buckets = {}
+    for point in points:
+        if point.hour_id is None:
+            continue
+        key = (point.spot_id, point.hour_id.value)
+        count_sum, sample_count = buckets.get(key, (0, 0))
+        buckets[key] = (count_sum + point.count, sample_count + 1)
+    if not buckets:
+        return
+
+    table = HourlyAverageDataPoint._meta.db_table
+    values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(buckets))
+    params = []
+    for (spot_id, hour_id), (count_sum, sample_count) in buckets.items():
+        params.extend([spot_id, hour_id, count_sum, sample_count, count_sum // sample_count])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (spot_id, hour_id, count_sum, sample_count, count)
+            VALUES {values}
+            ON CONFLICT (spot_id, hour_id) DO UPDATE SET
+                count_sum = {table}.count_sum + EXCLUDED.count_sum,
+                sample_count = {table}.sample_count + EXCLUDED.sample_count,
+                count = ({table}.count_sum + EXCLUDED.count_sum)
+                    / ({table}.sample_count + EXCLUDED.sample_count)
+            """,
+            params,
+        )
+
+
+@instrument("spot.update_current_state")
+def update_current_state(points, value_field, spot_field):
+    """
+    Copy the newest value of each spot in a batch of datapoints onto the spot with a single UPDATE,
+    so live reads never scan the datapoint tables. A spot is only updated when the value is newer
+    than the one it holds, so batches arriving out of order can't roll it back.
+
+    Args:
+        points (Iterable[Model]): Saved datapoints with spot_id and timestamp
+        value_field (str): Datapoint field to copy, e.g. count
+        spot_field (str): Spot field to copy it to, its timestamp is kept in <spot_field>_at
+    """
+    newest = {}
+    for point in points:
+        if point.timestamp is None:
+            continue
+        current = newest.get(point.spot_id)
+        if current is None or point.timestamp >= current.timestamp:
+            newest[point.spot_id] = point
+    if not newest:
+        return
+
+    values = ", ".join(["(%s::integer, %s, %s::timestamptz)"] * len(newest))
+    params = []
+    for spot_id, point in newest.items():
+        value = getattr(point, value_field)
+        params.extend([spot_id, getattr(value, "value", value), point.timestamp])
+    table = Spot._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table} SET {spot_field} = v.value, {spot_field}_at = v.timestamp
+            FROM (VALUES {values}) AS v (spot_id, value, timestamp)
+            WHERE {table}.id = v.spot_id
+                AND ({table}.{spot_field}_at IS NULL OR {table}.{spot_field}_at <= v.timestamp)
+            """,
+            params,
+        )
+
+
+class LocalHour(Func):
+    """The current hour in a timezone column, comparable to hour_id"""
+
+    template = "EXTRACT(HOUR FROM now() AT TIME ZONE %(expressions)s)::integer"
+    output_field = IntegerField()
+
+
+class SpotQuerySet(models.QuerySet):
+    @instrument("rollup.aggregate_all")
+    def aggregate_all(self, start=None, end=None, after_id=None, until_id=None):
+        """
+        Aggregate the DetectionDataPoints of a window for every spot in the queryset. The max is computed
+        in one grouped query and the results, stamped with the start of the window, are inserted in one statement.
+
+        Args:
+            start (datetime.datetime, optional):
+                Defaults to AGGREGATION_DATAPOINT_TIME_INTERVAL before end.
+            end (datetime.datetime, optional):
+                Defaults to the current time.
+                Exclusive, so consecutive windows never read a row twice.
+            after_id (int, optional):
+                Defaults to reading no rows of earlier windows.
+                The until_id of the previous window's rollup.
+            until_id (int, optional):
+                Defaults to no limit.
+                Highest DetectionDataPoint id to read, see counter.watermarks.committed_id_bound.
+
+        Returns:
+            list[AggregateDataPoint]: One AggregateDataPoint per spot that has DetectionDataPoints in the window
+        """
+        start, end = _window(settings.AGGREGATION_DATAPOINT_TIME_INTERVAL, start, end)
+        maxes = (
+            _window_rows(DetectionDataPoint, self, start, end, after_id, until_id)
+            .values("spot")
+            .annotate(count_max=Max("count"))
+            .order_by()
+        )
+        return AggregateDataPoint.objects.bulk_create(
+            [
+                AggregateDataPoint(spot_id=row["spot"], count=row["count_max"], timestamp=start)
+                for row in maxes
+            ]
+        )
+
+    @instrument("rollup.average_all")
+    def average_all(self, start=None, end=None, after_id=None, until_id=None):
+        """
+        Average the AggregateDataPoints of a window for every spot in the queryset. The mean is computed
+        in one grouped query and the results, stamped with the start of the window, are inserted in one statement.
+
+        Args:
+            start (datetime.datetime, optional):
+                Defaults to AVERAGE_DATAPOINT_TIME_INTERVAL before end.
+            end (datetime.datetime, optional):
+                Defaults to the current time.
+                Exclusive, so consecutive windows never read a row twice.
+            after_id (int, optional):
+                Defaults to reading no rows of earlier windows.
+                The until_id of the previous window's rollup.
+            until_id (int, optional):
+                Defaults to no limit.
+                Highest AggregateDataPoint id to read, see counter.watermarks.committed_id_bound.
+
+        Returns:
+            list[AverageDataPoint]: One AverageDataPoint per spot that has AggregateDataPoints in the window
+        """
+        start, end = _window(settings.AVERAGE_DATAPOINT_TIME_INTERVAL, start, end)
+        averages = (
+            _window_rows(AggregateDataPoint, self, start, end, after_id, until_id)
+            .values("spot")
+            .annotate(count_avg=Avg("count"))
+            .order_by()
+        )
+        return AverageDataPoint.objects.bulk_create(
+            [
+                AverageDataPoint(spot_id=row["spot"], count=int(row["count_avg"]), timestamp=start)
+                for row in averages
+            ]
+        )
+
+    @instrument("rollup.rebuild_hourly_averages")
+    def rebuild_hourly_averages(self):
+        """
+        Recalculate the HourlyAverageDataPoints of every spot in the queryset from all of their
+        AverageDataPoints with one INSERT ... SELECT ... ON CONFLICT statement, which also deletes
+        the buckets that no longer have any AverageDataPoints.
+        NOTE this still scans the full AverageDataPoint history, day to day the buckets are kept
+        current incrementally by add_to_hourly_averages.
+        """
+        spot_ids = list(self.values_list("pk", flat=True))
+        if not spot_ids:
+            return
+        table = HourlyAverageDataPoint._meta.db_table
+        source = AverageDataPoint._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH buckets AS (
+                    SELECT spot_id, hour_id, SUM(count) AS count_sum, COUNT(*) AS sample_count
+                    FROM {source}
+                    WHERE spot_id = ANY(%s) AND hour_id IS NOT NULL
+                    GROUP BY spot_id, hour_id
+                ), emptied AS (
+                    DELETE FROM {table} hourly
+                    WHERE hourly.spot_id = ANY(%s) AND NOT EXISTS (
+                        SELECT 1 FROM buckets
+                        WHERE buckets.spot_id = hourly.spot_id AND buckets.hour_id = hourly.hour_id
+                    )
+                )
+                INSERT INTO {table} (spot_id, hour_id, count_sum, sample_count, count)
+                SELECT spot_id, hour_id, count_sum, sample_count, count_sum / sample_count
+                FROM buckets
+                ON CONFLICT (spot_id, hour_id) DO UPDATE SET
+                    count_sum = EXCLUDED.count_sum,
+                    sample_count = EXCLUDED.sample_count,
+                    count = EXCLUDED.count
+                """,
+                [spot_ids, spot_ids],
+            )
+
+    @instrument("spot.update_all_times")
+    def update_all_times(self, date=None, days=1, processes=None):
+        """
+        Recalculate sunrise and sunset for every located spot in the queryset, save them with one bulk_update
+        and fill the SunWindows used by active().
+
+        Args:
+            date (datetime.date, optional):
+                Defaults to the current local date of each spot.
+            days (int, optional):
+                Defaults to 1.
+                Number of SunWindow days to fill from date on. Precomputing a week ahead
+                keeps active() correct even if the daily job is skipped.
+            processes (int, optional):
+                Defaults to None.
+                Compute the sun events across a process pool of this size.
+
+        Returns:
+            list[Spot]: The updated spots
+        """
+        spots = list(
+            self.filter(lat__isnull=False, lng__isnull=False, timezone__isnull=False).only(
+                "lat", "lng", "timezone", *SUN_FIELDS
+            )
+        )
+        precompute_sun_times(((spot.lat, spot.lng, spot.timezone) for spot in spots), date, days, processes)
+        for spot in spots:
+            set_sun_times(spot, date)
+        self.model.objects.bulk_update(spots, SUN_FIELDS)
+        spot_cache.invalidate([spot.pk for spot in spots])
+        save_sun_windows(spots, date, days)
+        return spots
+
+    def enrich_pending(self):
+        """
+        Geocode and resolve the timezone of every spot in the queryset that is missing them.
+        The deferred, queueable counterpart of the create_spot_data post_save handler.
+
+        Returns:
+            list[Spot]: The enriched spots
+        """
+        pending = self.filter(Q(lat__isnull=True) | Q(lng__isnull=True) | Q(timezone__isnull=True))
+        return [enrich_spot(spot) for spot in pending]
+
+    def stale_cams(self):
+        """Spots whose cached cam status has expired or was never checked"""
+        return self.filter(Q(cam_next_check_at__isnull=True) | Q(cam_next_check_at__lte=timezone.now()))
+
+    @instrument("spot.snapshot")
+    def snapshot(self):
+        """
+        The live state of every enabled spot in the queryset, read with one query. The newest datapoints
+        and the baseline for the current local hour are correlated subqueries, each a single lookup
+        on a (spot, timestamp DESC) or (spot, hour) index.
+
+        Returns:
+            Queryset[dict]: pk, name, current_count, current_count_at, current_surf_quality,
+                current_surf_quality_at, latest_detection_count, latest_detection_at, latest_average_count,
+                latest_average_at and hourly_baseline per spot
+        """
+        detection = DetectionDataPoint.objects.filter(spot=OuterRef("pk")).order_by("-timestamp")
+        average = AverageDataPoint.objects.filter(spot=OuterRef("pk")).order_by("-timestamp")
+        baseline = HourlyAverageDataPoint.objects.filter(spot=OuterRef("pk"), hour_id=LocalHour(OuterRef("timezone")))
+        return (
+            self.filter(enabled=True)
+            .annotate(
+                latest_detection_count=Subquery(detection.values("count")[:1]),
+                latest_detection_at=Subquery(detection.values("timestamp")[:1]),
+                latest_average_count=Subquery(average.values("count")[:1]),
+                latest_average_at=Subquery(average.values("timestamp")[:1]),
+                hourly_baseline=Subquery(baseline.values("count")[:1]),
+            )
+            .values(
+                "pk",
+                "name",
+                "current_count",
+                "current_count_at",
+                "current_surf_quality",
+                "current_surf_quality_at",
+                "latest_detection_count",
+                "latest_detection_at",
+                "latest_average_count",
+                "latest_average_at",
+                "hourly_baseline",
+            )
+            .order_by("pk")
+        )
+
+
+class SpotManager(models.Manager.from_queryset(SpotQuerySet)):
+    @instrument("spot.active")
     def active(self, cam_check=True):
         """
         Return spots where the sun up and the cam is operational
         Args:
             cam_check (bool, optional):
                 Defaults to True.
-                Checking cams in succession can take a while, thread the tasks to speed things upk.
+                Only cams whose cached status is stale are probed, concurrently,
+                bounded by CAM_CHECK_CONCURRENCY and CAM_CHECK_TIMEOUT.
 
         Returns:
             Queryset[Spot]: All active spots
@@ -73,19 +408,13 @@ class SpotManager(models.Manager):
 
         queryset = super().get_queryset()
         if cam_check:
-            pool = ThreadPool(cpu_count())
-            pool.map(check_cam, queryset)
-            pool.close()
-            pool.join()
-
-        return queryset.annotate(
-            local_sunrise=ConvertToTimezone("timezone", datetime_field="_sunrise"),
-            local_sunset=ConvertToTimezone("timezone", datetime_field="_sunset"),
-            local_now=ConvertToTimezone("timezone", now=True),
-        ).filter(
+            check_cams(queryset.stale_cams())
+
+        # Sun windows are stored in UTC ahead of time, so this is an indexed range lookup
+        now = timezone.now()
+        return queryset.filter(
             Q(enabled=True)
-            & Q(local_sunrise__lt=F("local_now"))
-            & Q(local_sunset__gt=F("local_now"))
+            & Exists(SunWindow.objects.filter(spot=OuterRef("pk"), sunrise__lt=now, sunset__gt=now))
         )
 
 
@@ -103,6 +432,7 @@ class Spot(models.Model):
     timezone = models.CharField(blank=True, null=True, max_length=200)
     
     current_surf_quality = EnumField(SurfQualityRating, null=True, max_length=12)
+    current_surf_quality_at = models.DateTimeField(blank=True, null=True)
 
     # Cam Url
     url = models.CharField(blank=True, null=True, max_length=200)
@@ -117,6 +447,12 @@ class Spot(models.Model):
 
     enabled = models.BooleanField(default=True, db_index=True)
     current_count = models.IntegerField(blank=True, null=True)
+    current_count_at = models.DateTimeField(blank=True, null=True)
+
+    # Cached cam health, failing cams are rechecked with exponential backoff
+    cam_checked_at = models.DateTimeField(blank=True, null=True)
+    cam_next_check_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    cam_failures = models.PositiveIntegerField(default=0)
 
     objects = SpotManager()
 
@@ -133,18 +469,16 @@ class Spot(models.Model):
         return self.sunset
 
     def is_active(self):
+        if self.sunrise is None:
+            return False
         return self.sunrise < datetime.datetime.now(pytz.utc).time() < self.sunset
 
+    @instrument("spot.update_times")
     def update_times(self):
         try:
-            loc = LocationInfo(self.major_city, self.country, "UTC", self.lat, self.lng)
-            data = sun.sun(loc.observer, datetime.datetime.now(pytz.utc))
-
-            self._sunrise = data.get("sunrise")
-            self._sunset = data.get("sunset")
-            self.sunrise = self._sunrise.astimezone(pytz.timezone(self.timezone)).time()
-            self.sunset = self._sunset.astimezone(pytz.timezone(self.timezone)).time()
-            self.save()
+            set_sun_times(self)
+            self.save(update_fields=SUN_FIELDS)
+            save_sun_windows([self], days=NEW_SPOT_SUN_WINDOW_DAYS)
 
         except Exception as e:
             LOGGER.error(f"ERROR updating sunrise and sunset: {e}")
@@ -157,15 +491,9 @@ class Spot(models.Model):
         Returns:
             AggregateDataPoint: The DetectionDataPoint max count from the last AGGREGATION_DATAPOINT_TIME_INTERVAL
         """
-        time_interval = settings.AGGREGATION_DATAPOINT_TIME_INTERVAL
-        time = datetime.datetime.now(pytz.utc) - datetime.timedelta(
-            minutes=int(time_interval)
-        )
-        points = DetectionDataPoint.objects.values_list("count", flat=True).filter(
-            spot=self, timestamp__gt=time
-        )
-        if bool(points):
-            return AggregateDataPoint.objects.create(spot=self, count=max(points))
+        points = Spot.objects.filter(pk=self.pk).aggregate_all()
+        if points:
+            return points[0]
 
     def average_aggregated_datapoints(self):
         """TODO: Weighted average?
@@ -174,154 +502,293 @@ class Spot(models.Model):
         Returns:
             AverageDataPoint: The AggregateDataPoint count mean from the last AVERAGE_DATAPOINT_TIME_INTERVAL
         """
-        time_interval = settings.AVERAGE_DATAPOINT_TIME_INTERVAL
-        time = datetime.datetime.now(pytz.utc) - datetime.timedelta(
-            minutes=int(time_interval)
-        )
-        points = AggregateDataPoint.objects.values_list("count", flat=True).filter(
-            spot=self, timestamp__gt=time
-        )
-        if bool(points):
-            return AverageDataPoint.objects.create(spot=self, count=int(mean(points)))
+        points = Spot.objects.filter(pk=self.pk).average_all()
+        if points:
+            return points[0]
 
     def update_hourly_averages(self):
         """
-        Recalculate the HourlyAverageDataPoints.
-        NOTE this is a thirsty method given that it will be aggregating all the AverageDataPoint in the db
+        Rebuild the HourlyAverageDataPoints from scratch.
+        NOTE new AverageDataPoints already keep the hourly buckets current, this is only needed to repair them.
         """
+        Spot.objects.filter(pk=self.pk).rebuild_hourly_averages()
+        return HourlyAverageDataPoint.objects.filter(spot=self)
 
-        averages = (
-            AverageDataPoint.objects.values("hour_id")
-            .annotate(count_avg=Avg("count"))
-            .filter(spot=self)
-        )
-        for av in averages:
-            HourlyAverageDataPoint.objects.update_or_create(
-                spot=self,
-                hour_id=av.get("hour_id"),
-                defaults=dict(count=av.get("count_avg")),
-            )
-        return averages
+    def enrich(self):
+        """Geocode the spot and resolve its timezone"""
+        return enrich_spot(self)
 
+    @instrument("cams.check_cam")
     def check_cam(self):
         """Ping the cam url, disable the spot if the cam is down"""
-        r = requests.get(self.url)
-        if r.ok:
-            self.enabled = True
-        else:
-            self.enabled = False
-        self.save()
+        record_cam_status(self, get_cam_prober().probe(self.url), timezone.now())
+        self.save(update_fields=CAM_STATUS_FIELDS)
+
+
+class RollupCheckpoint(models.Model):
+    """How far an incremental rollup has read, so each run only processes newer rows."""
+    class Meta:
+        app_label="counter"
+
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    # End of the last window a windowed rollup has read, and the highest source row id it read up to.
+    # Source rows older than watermark with ids up to watermark_id have been rolled up.
+    watermark = models.DateTimeField(null=True)
+    watermark_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class GeocodedLocation(models.Model):
+    """Persistent geocoding cache, so each city, country, and postal code is only looked up once."""
+    class Meta:
+        app_label="counter"
+        constraints = [
+            models.UniqueConstraint(fields=["city", "country", "postal_code"], name="unique_geocoded_location"),
+        ]
+
+    city = models.CharField(max_length=100)
+    country = models.CharField(max_length=100)
+    postal_code = models.CharField(max_length=10)
+    lat = models.FloatField()
+    lng = models.FloatField()
+
+
+class SunWindow(models.Model):
+    """Precomputed UTC sunrise and sunset of a spot for one local date, so activity checks need no timezone math"""
+    class Meta:
+        app_label="counter"
+        constraints = [
+            models.UniqueConstraint(fields=["spot", "date"], name="unique_spot_sun_window"),
+        ]
+        indexes = [
+            models.Index(fields=["sunset", "sunrise"], name="sun_window_range_idx"),
+        ]
+
+    spot = models.ForeignKey(Spot, on_delete=models.CASCADE)
+    date = models.DateField()
+    sunrise = models.DateTimeField()
+    sunset = models.DateTimeField()
+
+
+class SurfQualityDataPointQuerySet(TimeInfoQuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        update_current_state(objs, "rating", "current_surf_quality")
+        return objs
 
 
 class SurfQualityDataPoint(models.Model):
     """"Surf quality rating inferred from live stream."""
     class Meta:
         app_label="counter"
+        indexes = datapoint_indexes("surfquality")
         
-    spot = models.ForeignKey(Spot, on_delete=models.CASCADE)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    spot = models.ForeignKey(Spot, on_delete=models.CASCADE, db_index=False)
+    timestamp = models.DateTimeField(default=timezone.now)
     rating = EnumField(SurfQualityRating, null=True, max_length=12)
     hour_id = EnumIntegerField(HourIdentifierEnum, null=True)
     day_id = EnumIntegerField(DayIdentifierEnum, null=True)
     month_id = EnumIntegerField(MonthIdentifierEnum, null=True)
 
+    objects = SurfQualityDataPointQuerySet.as_manager()
+
 
 class HourlyAverageDataPoint(models.Model):
     """The historical average count of surfers in the watter for a spot and hour of the day."""
     class Meta:
         app_label="counter"
+        constraints = [
+            models.UniqueConstraint(fields=["spot", "hour_id"], name="unique_spot_hour_average"),
+        ]
 
     spot = models.ForeignKey(Spot, on_delete=models.CASCADE)
     hour_id = EnumIntegerField(HourIdentifierEnum)
     count = models.IntegerField(default=0)
 
+    # Running totals so a new AverageDataPoint updates its bucket without rescanning history
+    count_sum = models.BigIntegerField(default=0)
+    sample_count = models.IntegerField(default=0)
+
+
+class CrowdForecastManager(models.Manager):
+    def for_time(self, spot, when=None):
+        """
+        The forecast for a spot at a moment, defaulting to now, as a single indexed lookup
+
+        Returns:
+            CrowdForecast | None
+        """
+        tz = spot_cache.timezone(getattr(spot, "pk", spot))
+        if tz is None:
+            return None
+        local_time = (when or timezone.now()).astimezone(tz)
+        return self.filter(
+            spot=spot,
+            month_id=MonthIdentifierEnum(local_time.month),
+            day_id=DayIdentifierEnum(local_time.weekday()),
+            hour_id=HourIdentifierEnum(local_time.hour),
+        ).first()
+
+
+class CrowdForecast(models.Model):
+    """
+    Crowd and surf quality history of a spot by local month, weekday and hour.
+    Maintained incrementally by counter.forecast.refresh_crowd_forecasts.
+    """
+    class Meta:
+        app_label="counter"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["spot", "month_id", "day_id", "hour_id"], name="unique_spot_crowd_forecast"
+            ),
+        ]
+
+    spot = models.ForeignKey(Spot, on_delete=models.CASCADE)
+    month_id = EnumIntegerField(MonthIdentifierEnum)
+    day_id = EnumIntegerField(DayIdentifierEnum)
+    hour_id = EnumIntegerField(HourIdentifierEnum)
+
+    sample_count = models.IntegerField(default=0)
+    count_sum = models.BigIntegerField(default=0)
+    count_mean = models.FloatField(null=True)
+
+    # Surf quality rating distribution
+    rating_poor = models.IntegerField(default=0)
+    rating_poor_to_fair = models.IntegerField(default=0)
+    rating_fair = models.IntegerField(default=0)
+    rating_fair_to_good = models.IntegerField(default=0)
+    rating_good = models.IntegerField(default=0)
+
+    objects = CrowdForecastManager()
+
+    def rating_distribution(self):
+        return {rating: getattr(self, f"rating_{rating.name.lower()}") for rating in SurfQualityRating}
+
+
+class AverageDataPointQuerySet(TimeInfoQuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        add_to_hourly_averages(objs)
+        return objs
+
 
 class AverageDataPoint(models.Model):
     """Averaged data point. This will average all the Aggregate from the last AVERAGE_DATAPOINT_TIME_INTERVAL"""
     class Meta:
         app_label="counter"
+        indexes = datapoint_indexes("average")
 
-    spot = models.ForeignKey(Spot, on_delete=models.CASCADE)
+    spot = models.ForeignKey(Spot, on_delete=models.CASCADE, db_index=False)
     count = models.IntegerField(default=0)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
 
     # id info saved based on local timezone
     hour_id = EnumIntegerField(HourIdentifierEnum, null=True)
     day_id = EnumIntegerField(DayIdentifierEnum, null=True)
     month_id = EnumIntegerField(MonthIdentifierEnum, null=True)
 
+    objects = AverageDataPointQuerySet.as_manager()
+
 
 class AggregateDataPoint(models.Model):
     """Aggregated data point. This will average all the DetectionDataPoints from the last AGGREGATION_DATAPOINT_TIME_INTERVAL"""
     class Meta:
         app_label="counter"
+        indexes = datapoint_indexes("aggregate")
 
-    spot = models.ForeignKey(Spot, on_delete=models.CASCADE)
+    spot = models.ForeignKey(Spot, on_delete=models.CASCADE, db_index=False)
     count = models.IntegerField(default=0)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    objects = DataPointQuerySet.as_manager()
+
+
+class DetectionDataPointQuerySet(DataPointQuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        update_current_state(objs, "count", "current_count")
+        return objs
 
 
 class DetectionDataPoint(models.Model):
     """Base level data point. Will be created ever ~30 seconds per spot"""
     class Meta:
         app_label="counter"
+        indexes = datapoint_indexes("detection")
 
-    spot = models.ForeignKey(Spot, on_delete=models.CASCADE, null=False)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    spot = models.ForeignKey(Spot, on_delete=models.CASCADE, null=False, db_index=False)
+    # Defaulted rather than auto_now_add so batched ingestion can keep detector timestamps
+    timestamp = models.DateTimeField(default=timezone.now)
     count = models.IntegerField(default=0)
 
+    objects = DetectionDataPointQuerySet.as_manager()
+
+
+@receiver(pre_save, sender=AverageDataPoint, dispatch_uid="create_average_datapoint")
+@instrument("signal.create_average_datapoint_time_info")
+def create_average_datapoint_time_info(sender, instance, **kwargs):
+    """Before a new AverageDataPoint is inserted, add its hour_id, day_id, and month_id based on the timestamp"""
+    if instance._state.adding and instance.hour_id is None:
+        localize_time_info(instance)
 
-@receiver(post_save, sender=AverageDataPoint, dispatch_uid="create_average_datapoint")
-def create_average_datapoint_time_info(sender, instance, created, **kwargs):
-    """When a new AverageDataPoint is created, add its hour_id, day_id, and month_id based on the timestamp"""
+
+@receiver(post_save, sender=AverageDataPoint, dispatch_uid="update_hourly_average")
+@instrument("signal.update_hourly_average")
+def update_hourly_average(sender, instance, created, **kwargs):
+    """When a new AverageDataPoint is created, fold it into its HourlyAverageDataPoint"""
     if created:
-        local_time = instance.timestamp.astimezone(
-            pytz.timezone(instance.spot.timezone)
-        )
-        instance.hour_id = HourIdentifierEnum(local_time.hour)
-        instance.day_id = DayIdentifierEnum(local_time.weekday())
-        instance.month_id = MonthIdentifierEnum(local_time.month)
-        instance.save()
+        add_to_hourly_averages([instance])
+
 
+@receiver(pre_save, sender=SurfQualityDataPoint, dispatch_uid="create_surf_quality_data_point")
+@instrument("signal.create_surf_quality_data_point_time_info")
+def create_surf_quality_data_point_time_info(sender, instance, **kwargs):
+    """Before a new SurfQualityDataPoint is inserted, add its hour_id, day_id, and month_id based on the timestamp"""
+    if instance._state.adding and instance.hour_id is None:
+        localize_time_info(instance)
 
-@receiver(post_save, sender=SurfQualityDataPoint, dispatch_uid="create_surf_quality_data_point")
-def create_surf_quality_data_point_time_info(sender, instance, created, **kwargs):
-    """When a new SurfQualityDataPoint is created, add its hour_id, day_id, and month_id based on the timestamp"""
+
+@receiver(post_save, sender=DetectionDataPoint, dispatch_uid="update_current_count")
+@instrument("signal.update_current_count")
+def update_current_count(sender, instance, created, **kwargs):
+    """Keep Spot.current_count at the newest detection"""
     if created:
-        local_time = instance.timestamp.astimezone(
-            pytz.timezone(instance.spot.timezone)
-        )
-        instance.hour_id = HourIdentifierEnum(local_time.hour)
-        instance.day_id = DayIdentifierEnum(local_time.weekday())
-        instance.month_id = MonthIdentifierEnum(local_time.month)
-        instance.save()
+        update_current_state([instance], "count", "current_count")
 
 
+@receiver(post_save, sender=SurfQualityDataPoint, dispatch_uid="update_current_surf_quality")
+@instrument("signal.update_current_surf_quality")
+def update_current_surf_quality(sender, instance, created, **kwargs):
+    """Keep Spot.current_surf_quality at the newest rating"""
+    if created:
+        update_current_state([instance], "rating", "current_surf_quality")
+
+
+@receiver(post_save, sender=Spot, dispatch_uid="invalidate_spot_cache")
+@receiver(post_delete, sender=Spot, dispatch_uid="invalidate_deleted_spot_cache")
+@instrument("signal.invalidate_spot_cache")
+def invalidate_spot_cache(sender, instance, **kwargs):
+    spot_cache.invalidate([instance.pk])
+
 
 @receiver(post_save, sender=Spot, dispatch_uid="create_spot_data")
+@instrument("signal.create_spot_data")
 def create_spot_data(sender, instance, created, **kwargs):
-    """When new Spot is created, calculate and save the locational info."""
-    if created:
-        tz_find = TimezoneFinder()
-        geolocator = Nominatim(user_agent="SurfSight")
-
-        location = geolocator.geocode(
-            {
-                "city": instance.major_city,
-                "country": instance.country,
-                "postal_code": instance.postal_code,
-            }
-        )
-
-        instance.lat = location.latitude
-        instance.lng = location.longitude
-        tz_find = TimezoneFinder()
-        tz = tz_find.timezone_at(lng=instance.lng, lat=instance.lat)
-        instance.timezone = tz
-        instance.save()
+    """
+    When new Spot is created, calculate and save the locational info.
+    With SPOT_ENRICHMENT "on_commit" this runs after the creating transaction commits, so no HTTP call holds it open,
+    with "deferred" it is left to Spot.objects.enrich_pending(), and with "sync" it runs immediately.
+    """
+    if not created or (instance.lat is not None and instance.timezone):
+        return
+    mode = getattr(settings, "SPOT_ENRICHMENT", "on_commit")
+    if mode == "sync":
+        enrich_spot(instance)
+    elif mode == "on_commit":
+        transaction.on_commit(lambda: enrich_spot(instance))
 
 
 def check_cam(spot):
-    r = requests.get(spot.url)
-    spot.enabled = r.ok
-    spot.save()
+    """Check and save the cam of a single spot. For many spots use check_cams, which writes from one thread."""
+    spot.check_cam()
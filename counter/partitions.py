@@ -0,0 +1,256 @@
+import calendar
+import datetime
+import logging
+import re
+from collections import namedtuple
+
+import pytz
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+LOGGER = logging.getLogger(__name__)
+
+# The range partitioned datapoint tables, partitioned by migration 0016 and extended by ensure_partitions.
+# prefix is the one of their (spot, timestamp) and BRIN index names.
+PARTITIONED_TABLES = {
+    "DetectionDataPoint": dict(table="counter_detectiondatapoint", prefix="detection", period="day"),
+    "AggregateDataPoint": dict(table="counter_aggregatedatapoint", prefix="aggregate", period="month"),
+}
+PARTITIONS_AHEAD = {"day": 14, "month": 3}
+NAME_FORMATS = {"day": "%Y%m%d", "month": "%Y%m"}
+
+Partition = namedtuple("Partition", ["name", "lower", "upper"])
+
+BOUND_RE = re.compile(r"FROM \((.+)\) TO \((.+)\)")
+
+
+def period_start(moment, period):
+    moment = moment.astimezone(pytz.utc)
+    if period == "month":
+        return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_period(moment, period):
+    if period == "month":
+        days = calendar.monthrange(moment.year, moment.month)[1]
+        return moment + datetime.timedelta(days=days)
+    return moment + datetime.timedelta(days=1)
+
+
+def _is_partitioned(table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))", [table]
+        )
+        return cursor.fetchone()[0]
+
+
+def is_partitioned(model):
+    return _is_partitioned(model._meta.db_table)
+
+
+def _parse_bound(bound):
+    if bound in ("MINVALUE", "MAXVALUE"):
+        return None
+    return parse_datetime(bound.strip("'"))
+
+
+def _partitions(table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            """,
+            [table],
+        )
+        rows = cursor.fetchall()
+    result = []
+    for name, bound in rows:
+        match = BOUND_RE.search(bound)
+        if match:
+            result.append(Partition(name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+    return sorted(result, key=lambda p: p.upper)
+
+
+def partitions(model):
+    """
+    The range partitions of a model's table, oldest first. The DEFAULT partition is not included.
+    lower is None for the archive partition that starts at MINVALUE.
+
+    Returns:
+        list[Partition]
+    """
+    return _partitions(model._meta.db_table)
+
+
+def _create_partition(cursor, table, name, lower, upper):
+    """
+    Create the partition of [lower, upper). Rows of the range that landed in the DEFAULT partition
+    while no partition covered it are moved into the new one before it is attached.
+    """
+    default = f"{table}_default"
+    cursor.execute(
+        f'SELECT EXISTS (SELECT 1 FROM "{default}" WHERE "timestamp" >= %s AND "timestamp" < %s)', [lower, upper]
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(f'CREATE TABLE "{name}" PARTITION OF "{table}" FOR VALUES FROM (%s) TO (%s)', [lower, upper])
+        return
+    LOGGER.warning(f"Moving rows from {default} into the new partition {name}")
+    with transaction.atomic():
+        cursor.execute(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS)')
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM "{default}" WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *
+            )
+            INSERT INTO "{name}" SELECT * FROM moved
+            """,
+            [lower, upper],
+        )
+        cursor.execute(f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)', [lower, upper])
+
+
+def _ensure_partitions(layout, ahead=None):
+    table, period = layout["table"], layout["period"]
+    if not _is_partitioned(table):
+        return []
+    ahead = PARTITIONS_AHEAD[period] if ahead is None else ahead
+
+    existing = _partitions(table)
+    lower = existing[-1].upper if existing else period_start(timezone.now(), period)
+    until = period_start(timezone.now(), period)
+    for _ in range(ahead):
+        until = next_period(until, period)
+
+    created = []
+    with connection.cursor() as cursor:
+        while lower < until:
+            upper = next_period(lower, period)
+            name = f"{table}_p{lower.strftime(NAME_FORMATS[period])}"
+            _create_partition(cursor, table, name, lower, upper)
+            created.append(name)
+            lower = upper
+    if created:
+        LOGGER.info(f"Created partitions {', '.join(created)}")
+    return created
+
+
+def ensure_partitions(model, ahead=None):
+    """
+    Create the partitions needed to hold rows for the next ahead periods. A no-op on unpartitioned tables.
+    Rows past the last partition land in the DEFAULT partition until a partition covering them is created.
+
+    Args:
+        model (Model): A PARTITIONED_TABLES model
+        ahead (int, optional):
+            Defaults to PARTITIONS_AHEAD of the model's period.
+
+    Returns:
+        list[str]: Names of the created partitions
+    """
+    return _ensure_partitions(PARTITIONED_TABLES[model.__name__], ahead)
+
+
+def drop_partition(model, partition):
+    """Detach a partition and drop it, far cheaper than deleting its rows"""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{partition.name}"')
+        cursor.execute(f'DROP TABLE "{partition.name}"')
+    LOGGER.info(f"Dropped partition {partition.name}")
+
+
+def ensure_all_partitions():
+    from . import models
+
+    return {name: ensure_partitions(getattr(models, name)) for name in PARTITIONED_TABLES}
+
+
+def partition_table(name, concurrently=True):
+    """
+    Turn a PARTITIONED_TABLES table into a range partitioned one, keeping ingestion running. Run by migration 0016.
+
+    The existing table is attached as the archive partition covering everything up to the end of the current
+    period, so no rows are copied. Everything that reads the whole table runs before the exclusive locks are
+    taken: the (id, timestamp) primary key index is built concurrently, and a NOT VALID check bounding the
+    archive is validated while writes continue, so the attach skips its own scan. New rows land in per period
+    partitions created ahead of time, or in the DEFAULT partition past them.
+
+    Args:
+        name (str): The model name
+        concurrently (bool, optional):
+            Defaults to True.
+            Build the index concurrently, which can't run inside a transaction.
+    """
+    layout = PARTITIONED_TABLES[name]
+    table, prefix, period = layout["table"], layout["prefix"], layout["period"]
+    archive = f"{table}_archive"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE UNIQUE INDEX {"CONCURRENTLY" if concurrently else ""} IF NOT EXISTS "{archive}_pkey" '
+            f'ON "{table}" (id, "timestamp")'
+        )
+        cursor.execute(f'SELECT max("timestamp") FROM "{table}"')
+        newest = max(filter(None, [cursor.fetchone()[0], timezone.now()]))
+        boundary = next_period(period_start(newest, period), period)
+        # Adding a NOT VALID check only needs a brief lock, validating it doesn't block writes
+        cursor.execute(
+            f'ALTER TABLE "{table}" ADD CONSTRAINT "{archive}_bound" CHECK ("timestamp" < %s) NOT VALID', [boundary]
+        )
+        cursor.execute(f'ALTER TABLE "{table}" VALIDATE CONSTRAINT "{archive}_bound"')
+
+        with transaction.atomic():
+            cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'", [table])
+            # A partition's primary key has to include the partition key
+            cursor.execute(f'ALTER TABLE "{table}" DROP CONSTRAINT "{cursor.fetchone()[0]}"')
+            cursor.execute(
+                f'ALTER TABLE "{table}" ADD CONSTRAINT "{archive}_pkey" PRIMARY KEY USING INDEX "{archive}_pkey"'
+            )
+            cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{archive}"')
+            cursor.execute(f'ALTER INDEX "{prefix}_spot_ts_idx" RENAME TO "{prefix}_archive_spot_ts_idx"')
+            cursor.execute(f'ALTER INDEX "{prefix}_ts_brin" RENAME TO "{prefix}_archive_ts_brin"')
+
+            cursor.execute(
+                f'CREATE TABLE "{table}" (LIKE "{archive}" INCLUDING DEFAULTS) PARTITION BY RANGE ("timestamp")'
+            )
+            cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY (id, "timestamp")')
+            cursor.execute(
+                f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_spot_id_fk_counter_spot_id" '
+                f"FOREIGN KEY (spot_id) REFERENCES counter_spot (id) DEFERRABLE INITIALLY DEFERRED"
+            )
+            cursor.execute(f'CREATE INDEX "{prefix}_spot_ts_idx" ON "{table}" (spot_id, "timestamp" DESC)')
+            cursor.execute(f'CREATE INDEX "{prefix}_ts_brin" ON "{table}" USING brin ("timestamp")')
+            cursor.execute(f'ALTER SEQUENCE "{table}_id_seq" OWNED BY "{table}".id')
+
+            # The archive's indexes and foreign key match the parent's, so they are attached rather than rebuilt
+            cursor.execute(
+                f'ALTER TABLE "{table}" ATTACH PARTITION "{archive}" FOR VALUES FROM (MINVALUE) TO (%s)', [boundary]
+            )
+            cursor.execute(f'ALTER TABLE "{archive}" DROP CONSTRAINT "{archive}_bound"')
+            cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+            _ensure_partitions(layout)
+
+
+def unpartition_table(name):
+    """Copy a partitioned PARTITIONED_TABLES table back into a plain one, reverses partition_table"""
+    layout = PARTITIONED_TABLES[name]
+    table, prefix = layout["table"], layout["prefix"]
+    with connection.cursor() as cursor:
+        for statement in [
+            f'CREATE TABLE "{table}_plain" (LIKE "{table}" INCLUDING DEFAULTS)',
+            f'INSERT INTO "{table}_plain" SELECT * FROM "{table}"',
+            f'ALTER SEQUENCE "{table}_id_seq" OWNED BY "{table}_plain".id',
+            f'DROP TABLE "{table}"',
+            f'ALTER TABLE "{table}_plain" RENAME TO "{table}"',
+            f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY (id)',
+            f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_spot_id_fk_counter_spot_id" '
+            f"FOREIGN KEY (spot_id) REFERENCES counter_spot (id) DEFERRABLE INITIALLY DEFERRED",
+            f'CREATE INDEX "{prefix}_spot_ts_idx" ON "{table}" (spot_id, "timestamp" DESC)',
+            f'CREATE INDEX "{prefix}_ts_brin" ON "{table}" USING brin ("timestamp")',
+        ]:
+            cursor.execute(statement)
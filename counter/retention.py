@@ -0,0 +1,165 @@
+import datetime
+import logging
+import time
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .metrics import instrument
+from .models import AggregateDataPoint, DetectionDataPoint, RollupCheckpoint, Spot, SunWindow
+from .partitions import drop_partition, ensure_all_partitions, is_partitioned, partitions
+from .scheduler import ShardOf, checkpoint_name, rollup_shards
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = {
+    "DetectionDataPoint": 7,
+    "AggregateDataPoint": 90,
+}
+DEFAULT_RETENTION_BATCH_SIZE = 5000
+
+# SunWindows are kept this many days before the current UTC date, local dates trail it by up to a day
+SUN_WINDOW_KEEP_DAYS = 1
+
+# Each purgeable table and the counter.scheduler task that rolls it up.
+# Tables without a retention setting, like AverageDataPoint, are kept forever.
+ROLLUPS = [
+    (DetectionDataPoint, "aggregate"),
+    (AggregateDataPoint, "average"),
+]
+
+
+def retention_days():
+    return getattr(settings, "DATAPOINT_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)
+
+
+def rollup_watermarks(task, shards=None):
+    """
+    How far the scheduled rollup task has read for every spot, saved in the RollupCheckpoint of its shard.
+    Rows older than the watermark with ids up to the watermark id have been rolled up. Rows that arrived
+    later are read by the next window, even with an older timestamp, so they are not.
+
+    Args:
+        task (str): A windowed counter.scheduler.ROLLUP_TASKS name
+        shards (int, optional):
+            Defaults to ROLLUP_SHARDS.
+
+    Returns:
+        dict[int, tuple[datetime.datetime, int]]: spot id -> (watermark, watermark id),
+            without the spots whose shard hasn't been rolled up yet
+    """
+    shards = shards or rollup_shards()
+    names = {checkpoint_name(task, shard, shards): shard for shard in range(shards)}
+    by_shard = {
+        names[name]: (watermark, watermark_id)
+        for name, watermark, watermark_id in RollupCheckpoint.objects.filter(
+            name__in=names, watermark__isnull=False
+        ).values_list("name", "watermark", "watermark_id")
+    }
+    return {
+        pk: by_shard[shard]
+        for pk, shard in Spot.objects.annotate(shard=ShardOf("id", shards)).values_list("pk", "shard")
+        if shard in by_shard
+    }
+
+
+def drop_expired_partitions(model, cutoff, watermarks):
+    """
+    Drop whole partitions that end before the cutoff once every row in them has been rolled up.
+
+    Returns:
+        int: The number of dropped partitions
+    """
+    dropped = 0
+    read_up_to = min((watermark_id for _, watermark_id in watermarks.values()), default=0)
+    for partition in partitions(model):
+        if partition.upper > cutoff:
+            break
+        rolled_up = [spot_id for spot_id, (watermark, _) in watermarks.items() if watermark >= partition.upper]
+        pending = ~Q(spot_id__in=rolled_up) | Q(id__gt=read_up_to)
+        if model.objects.filter(pending, timestamp__lt=partition.upper).exists():
+            break
+        drop_partition(model, partition)
+        dropped += 1
+    return dropped
+
+
+def purge_model(model, task, days, batch_size=DEFAULT_RETENTION_BATCH_SIZE, deadline=None):
+    """
+    Delete rows older than days that have been rolled up, in bounded batches.
+
+    Partitioned tables first drop whole expired partitions. The remaining rows are deleted in batches,
+    each its own short statement, so locks are never held for long. Deletes are idempotent,
+    so a purge stopped by the deadline or a failure resumes by simply running again.
+
+    Args:
+        model (Model): The datapoint model to purge
+        task (str): The counter.scheduler task that rolls the rows up
+        days (int): Rows older than this many days may be deleted
+        batch_size (int, optional):
+            Defaults to DEFAULT_RETENTION_BATCH_SIZE.
+        deadline (float, optional):
+            time.monotonic() value after which no new batch is started
+
+    Returns:
+        int: The number of deleted rows
+    """
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    watermarks = rollup_watermarks(task)
+    if is_partitioned(model):
+        drop_expired_partitions(model, cutoff, watermarks)
+
+    deleted = 0
+    for spot_id, (watermark, watermark_id) in watermarks.items():
+        expired = model.objects.filter(spot_id=spot_id, timestamp__lt=min(cutoff, watermark), id__lte=watermark_id)
+        while deadline is None or time.monotonic() < deadline:
+            pks = list(expired.values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+            count, _ = expired.filter(pk__in=pks).delete()
+            deleted += count
+    LOGGER.info(f"Purged {deleted} {model.__name__} rows older than {days} days")
+    return deleted
+
+
+def purge_sun_windows():
+    """
+    Delete the SunWindows of local dates that have ended everywhere.
+
+    Returns:
+        int: The number of deleted rows
+    """
+    cutoff = timezone.now().date() - datetime.timedelta(days=SUN_WINDOW_KEEP_DAYS)
+    deleted, _ = SunWindow.objects.filter(date__lt=cutoff).delete()
+    LOGGER.info(f"Purged {deleted} SunWindow rows before {cutoff}")
+    return deleted
+
+
+@instrument("retention.purge_expired_datapoints")
+def purge_expired_datapoints(batch_size=None, max_seconds=None):
+    """
+    Enforce DATAPOINT_RETENTION_DAYS on every rolled up datapoint table,
+    creating upcoming partitions on partitioned tables along the way, and drop past SunWindows.
+
+    Args:
+        batch_size (int, optional):
+            Defaults to RETENTION_BATCH_SIZE.
+        max_seconds (float, optional):
+            Stop starting new batches after this long, the next run picks up where this one stopped.
+
+    Returns:
+        dict[str, int]: Deleted row counts by model name
+    """
+    batch_size = batch_size or getattr(settings, "RETENTION_BATCH_SIZE", DEFAULT_RETENTION_BATCH_SIZE)
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    policy = retention_days()
+    ensure_all_partitions()
+    results = {}
+    for model, task in ROLLUPS:
+        days = policy.get(model.__name__)
+        if days is None:
+            continue
+        results[model.__name__] = purge_model(model, task, days, batch_size, deadline)
+    results[SunWindow.__name__] = purge_sun_windows()
+    return results
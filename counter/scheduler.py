@@ -0,0 +1,206 @@
+import datetime
+import logging
+import multiprocessing
+import zlib
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Func, IntegerField
+from django.utils import timezone
+
+from .metrics import instrument
+from .models import AggregateDataPoint, DetectionDataPoint, RollupCheckpoint, Spot
+from .partitions import ensure_all_partitions
+from .watermarks import committed_id_bound
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_ROLLUP_SHARDS = 4
+DAY = 24 * 60 * 60
+SUN_WINDOW_DAYS = 7
+
+# Most intervals a windowed task rolls up in one run after the scheduler was down, older ones are skipped
+MAX_CATCH_UP_PERIODS = 48
+
+# A rollup step run for every shard once per interval. interval returns seconds, run takes the shard's spots,
+# the [start, end) window of the interval and the (after_id, until_id] range of source ids that arrived since
+# the previous window. Tasks with a source model run once per completed interval, so intervals missed while
+# the scheduler was down are still rolled up, the others only run for the latest one.
+RollupTask = namedtuple("RollupTask", ["interval", "run", "source"])
+
+ROLLUP_TASKS = {
+    "aggregate": RollupTask(
+        lambda: settings.AGGREGATION_DATAPOINT_TIME_INTERVAL * 60,
+        lambda spots, *window: spots.aggregate_all(*window),
+        DetectionDataPoint,
+    ),
+    "average": RollupTask(
+        lambda: settings.AVERAGE_DATAPOINT_TIME_INTERVAL * 60,
+        lambda spots, *window: spots.average_all(*window),
+        AggregateDataPoint,
+    ),
+    "sun_times": RollupTask(lambda: DAY, lambda spots, *window: spots.update_all_times(days=SUN_WINDOW_DAYS), None),
+}
+
+# Results of one task on one shard
+RAN, DONE, LOCKED = "ran", "done", "locked"
+
+
+def rollup_shards():
+    return getattr(settings, "ROLLUP_SHARDS", DEFAULT_ROLLUP_SHARDS)
+
+
+class ShardOf(Func):
+    """The shard, in range(shards), of an integer column by its Postgres hash"""
+
+    template = "mod(abs(hashint4(%(expressions)s)::bigint), %(shards)d)"
+    output_field = IntegerField()
+
+    def __init__(self, expression, shards, **extra):
+        super().__init__(expression, shards=int(shards), **extra)
+
+
+def shard_spots(shard, shards):
+    """The spots of one shard. Every spot is in exactly one shard of a given shard count."""
+    return Spot.objects.annotate(shard=ShardOf("id", shards)).filter(shard=shard)
+
+
+def lock_key(task, shards):
+    """First advisory lock key of a task, the shard is the second"""
+    return zlib.crc32(f"rollup:{task}:{shards}".encode()) & 0x7FFFFFFF
+
+
+def checkpoint_name(task, shard, shards):
+    return f"rollup.{task}.{shard}-of-{shards}"
+
+
+def period_bounds(period, interval):
+    """
+    The [start, end) window rolled up by the run of a period, the interval that ended as the period began
+
+    Returns:
+        tuple[datetime.datetime, datetime.datetime]
+    """
+    end = datetime.datetime.fromtimestamp(period * interval, datetime.timezone.utc)
+    return end - datetime.timedelta(seconds=interval), end
+
+
+def _try_lock(task, shard, shards):
+    """Take the transaction scoped advisory lock of a task and shard, released on commit or rollback"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(%s, %s)", [lock_key(task, shards), shard])
+        return cursor.fetchone()[0]
+
+
+@instrument("rollup.run_shard")
+def run_shard(shard, shards=None, tasks=None, now=None):
+    """
+    Run the rollup tasks of one shard for the intervals completed since their last run.
+
+    Each task runs in its own transaction holding an advisory lock on (task, shard), so a second
+    worker given the same shard skips it rather than rolling the same spots up twice. The last
+    completed interval is saved in a RollupCheckpoint in the same transaction, so a restarted
+    cycle only redoes the tasks that didn't finish. Rollups read the fixed window of each interval
+    rather than the time before now, so runs at irregular times neither overlap nor leave gaps.
+    They only read source rows up to counter.watermarks.committed_id_bound, saved in the checkpoint,
+    and rows of earlier windows that committed since are read along with the next window.
+
+    Args:
+        shard (int): The shard, in range(shards)
+        shards (int, optional):
+            Defaults to ROLLUP_SHARDS.
+            Must be the same for every worker of a cycle.
+        tasks (Iterable[str], optional):
+            Defaults to every ROLLUP_TASKS entry, in order.
+        now (datetime.datetime, optional):
+            Defaults to the current time.
+
+    Returns:
+        dict[str, str]: ran, done (already completed this interval) or locked (another worker has it) by task
+    """
+    shards = shards or rollup_shards()
+    if not 0 <= shard < shards:
+        raise ValueError(f"Shard {shard} is not in range({shards})")
+    now = now or timezone.now()
+    spots = shard_spots(shard, shards)
+    results = {}
+    for name in tasks or ROLLUP_TASKS:
+        task = ROLLUP_TASKS[name]
+        interval = task.interval()
+        period = int(now.timestamp()) // interval
+        # Read before any lock is taken, it can wait for writers
+        bound = committed_id_bound(task.source) if task.source else None
+        with transaction.atomic():
+            if not _try_lock(name, shard, shards):
+                results[name] = LOCKED
+                continue
+            checkpoint, _ = RollupCheckpoint.objects.select_for_update().get_or_create(
+                name=checkpoint_name(name, shard, shards)
+            )
+            if checkpoint.position >= period:
+                results[name] = DONE
+                continue
+            first = period
+            after_id = until_id = checkpoint.watermark_id
+            if task.source:
+                # Without a bound rows past the last one are left to the next run
+                until_id = max(bound or 0, after_id)
+                if not checkpoint.position:
+                    # A new checkpoint starts at the current window, not at the whole history
+                    after_id = until_id
+                else:
+                    first = max(checkpoint.position + 1, period - MAX_CATCH_UP_PERIODS + 1)
+                    if first > checkpoint.position + 1:
+                        LOGGER.warning(f"Skipping {first - checkpoint.position - 1} {name} intervals of shard {shard}")
+            for missed in range(first, period + 1):
+                task.run(spots, *period_bounds(missed, interval), after_id, until_id)
+                after_id = until_id
+            checkpoint.position = period
+            if task.source:
+                checkpoint.watermark = period_bounds(period, interval)[1]
+                checkpoint.watermark_id = until_id
+            checkpoint.save(update_fields=["position", "watermark", "watermark_id", "updated_at"])
+            results[name] = RAN
+    LOGGER.info(f"Rollup shard {shard} of {shards}: {results}")
+    return results
+
+
+def _run_shard_in_worker(args):
+    shard, shards, tasks = args
+    try:
+        return shard, run_shard(shard, shards, tasks)
+    finally:
+        connections.close_all()
+
+
+def run_rollups(shards=None, processes=None, tasks=None):
+    """
+    Run a full rollup cycle, every shard across a pool of worker processes, after creating any
+    missing datapoint partitions. Airflow can instead map a task over range(shards) that each call
+    run_shard, downstream of a single ensure_all_partitions task.
+
+    Args:
+        shards (int, optional):
+            Defaults to ROLLUP_SHARDS.
+        processes (int, optional):
+            Defaults to shards.
+            Worker processes, 1 runs every shard in this process.
+        tasks (Iterable[str], optional):
+            Defaults to every ROLLUP_TASKS entry.
+
+    Returns:
+        dict[int, dict[str, str]]: run_shard results by shard
+    """
+    shards = shards or rollup_shards()
+    processes = min(processes or shards, shards)
+    tasks = list(tasks) if tasks else None
+    work = [(shard, shards, tasks) for shard in range(shards)]
+    ensure_all_partitions()
+    if processes <= 1:
+        return {shard: run_shard(shard, shards, tasks) for shard, shards, tasks in work}
+
+    # Forked workers must not share the parent's database connection
+    connections.close_all()
+    with multiprocessing.Pool(processes) as pool:
+        return dict(pool.imap_unordered(_run_shard_in_worker, work))
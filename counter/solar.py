@@ -0,0 +1,167 @@
+import datetime
+import logging
+from multiprocessing import Pool
+
+import pytz
+from astral import Observer, sun
+from django.db import connection
+
+LOGGER = logging.getLogger(__name__)
+
+SUN_FIELDS = ["_sunrise", "_sunset", "sunrise", "sunset"]
+
+# Rows per upsert statement, keeps the statement well under the Postgres parameter limit
+UPSERT_BATCH_SIZE = 1000
+
+# Memoized dates this many days before the current UTC date are dropped, local dates trail it by up to a day
+SUN_TIMES_KEEP_DAYS = 2
+
+# New spots get SunWindows for today and tomorrow, so they stay correct until the daily sun_times job reaches them
+NEW_SPOT_SUN_WINDOW_DAYS = 2
+
+# (lat, lng, local date, timezone name) -> (sunrise, sunset) as utc aware datetimes, or None
+_SUN_TIMES = {}
+_pruned_on = None
+
+
+def _compute_sun_times(lat, lng, date, tz_name):
+    """
+    Sunrise and sunset, clamped to the whole local day during polar day.
+
+    Returns:
+        tuple[datetime.datetime, datetime.datetime] | None: None during polar night
+    """
+    observer = Observer(lat, lng)
+    tz = pytz.timezone(tz_name)
+    try:
+        sunrise = sun.sunrise(observer, date, tzinfo=tz)
+        sunset = sun.sunset(observer, date, tzinfo=tz)
+    except ValueError:
+        # The sun doesn't cross the horizon on this date
+        if sun.elevation(observer, sun.noon(observer, date, tzinfo=tz)) <= 0:
+            return None
+        sunrise = tz.localize(datetime.datetime.combine(date, datetime.time.min))
+        sunset = tz.localize(datetime.datetime.combine(date, datetime.time.max))
+    return sunrise.astimezone(pytz.utc), sunset.astimezone(pytz.utc)
+
+
+def _remember(keys, results):
+    """Add to the memo, dropping past dates once a day so long running workers don't grow it forever"""
+    global _pruned_on
+    today = datetime.datetime.now(pytz.utc).date()
+    if _pruned_on != today:
+        cutoff = today - datetime.timedelta(days=SUN_TIMES_KEEP_DAYS)
+        for key in list(_SUN_TIMES):
+            if key[2] < cutoff:
+                _SUN_TIMES.pop(key, None)
+        _pruned_on = today
+    _SUN_TIMES.update(zip(keys, results))
+
+
+def local_date(tz_name, now=None):
+    """The current calendar date in a timezone"""
+    return (now or datetime.datetime.now(pytz.utc)).astimezone(pytz.timezone(tz_name)).date()
+
+
+def sun_times(lat, lng, date, tz_name):
+    """
+    Sunrise and sunset for a location on a local calendar date, memoized per process
+
+    Returns:
+        tuple[datetime.datetime, datetime.datetime] | None: utc aware sunrise and sunset, None during polar night
+    """
+    key = (lat, lng, date, tz_name)
+    if key not in _SUN_TIMES:
+        _remember([key], [_compute_sun_times(*key)])
+    return _SUN_TIMES[key]
+
+
+def precompute_sun_times(locations, start=None, days=1, processes=None):
+    """
+    Fill the sun time memo for every location over a window of days.
+
+    Args:
+        locations (Iterable[tuple[float, float, str]]): (lat, lng, timezone name) triples
+        start (datetime.date, optional):
+            Defaults to the current date of each location.
+            First local date of the window.
+        days (int, optional):
+            Defaults to 1.
+            Number of days to compute, starting at start.
+        processes (int, optional):
+            Defaults to None.
+            Spread the computation over a process pool of this size.
+    """
+    keys = {
+        (lat, lng, (start or local_date(tz_name)) + datetime.timedelta(days=offset), tz_name)
+        for lat, lng, tz_name in set(locations)
+        for offset in range(days)
+    }
+    keys = [key for key in keys if key not in _SUN_TIMES]
+    if not keys:
+        return
+    if processes and processes > 1:
+        with Pool(processes) as pool:
+            results = pool.starmap(_compute_sun_times, keys, chunksize=max(1, len(keys) // (processes * 4)))
+    else:
+        results = [_compute_sun_times(*key) for key in keys]
+    _remember(keys, results)
+
+
+def set_sun_times(spot, date=None):
+    """
+    Set the utc and local sunrise/sunset of a spot for a local date, defaulting to its current date.
+    They are all None during polar night.
+    """
+    date = date or local_date(spot.timezone)
+    times = sun_times(spot.lat, spot.lng, date, spot.timezone)
+    if times is None:
+        spot._sunrise = spot._sunset = spot.sunrise = spot.sunset = None
+        return spot
+    spot._sunrise, spot._sunset = times
+    tz = pytz.timezone(spot.timezone)
+    spot.sunrise = spot._sunrise.astimezone(tz).time()
+    spot.sunset = spot._sunset.astimezone(tz).time()
+    return spot
+
+
+def save_sun_windows(spots, start=None, days=1):
+    """
+    Upsert the SunWindow rows of every spot for a window of local dates, in batched statements.
+    Sun times are read through the memo, so call precompute_sun_times first for large batches.
+    Polar night dates get no row, so the spot isn't active on them.
+
+    Args:
+        spots (Iterable[Spot]): Located spots
+        start (datetime.date, optional):
+            Defaults to the current date of each spot.
+            First local date of the window.
+        days (int, optional):
+            Defaults to 1.
+    """
+    from .models import SunWindow
+
+    rows = []
+    for spot in spots:
+        spot_start = start or local_date(spot.timezone)
+        for offset in range(days):
+            date = spot_start + datetime.timedelta(days=offset)
+            times = sun_times(spot.lat, spot.lng, date, spot.timezone)
+            if times is not None:
+                rows.append((spot.pk, date, *times))
+
+    table = SunWindow._meta.db_table
+    with connection.cursor() as cursor:
+        for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[i : i + UPSERT_BATCH_SIZE]
+            values = ", ".join(["(%s, %s, %s, %s)"] * len(batch))
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (spot_id, date, sunrise, sunset)
+                VALUES {values}
+                ON CONFLICT (spot_id, date) DO UPDATE SET
+                    sunrise = EXCLUDED.sunrise,
+                    sunset = EXCLUDED.sunset
+                """,
+                [param for row in batch for param in row],
+            )
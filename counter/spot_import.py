@@ -0,0 +1,178 @@
+import csv
+import json
+import logging
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .geo import geocode_many, timezones_at
+from .models import Spot
+from .solar import NEW_SPOT_SUN_WINDOW_DAYS, precompute_sun_times, save_sun_windows, set_sun_times
+
+LOGGER = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ("name", "major_city", "country", "postal_code", "url")
+DEFAULT_IMPORT_BATCH_SIZE = 500
+
+
+class ImportReport:
+    """Running totals of a spot import. failures holds (row number, reason) pairs."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.rows = 0
+        self.created = 0
+        self.duplicates = 0
+        self.failures = []
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def fail(self, row_number, reason):
+        self.failures.append((row_number, reason))
+        LOGGER.warning(f"Spot import row {row_number} failed: {reason}")
+
+
+def _spot_from_row(row, **fields):
+    return Spot(
+        name=row["name"],
+        major_city=row["major_city"],
+        country=row["country"],
+        postal_code=str(row["postal_code"]),
+        url=row["url"],
+        **fields,
+    )
+
+
+def read_spot_rows(path):
+    """
+    Stream spot rows from a CSV file with a header, a JSON list, or JSON lines (.jsonl).
+
+    Yields:
+        tuple[int, dict]: The 1-based row number and the row
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline="") as f:
+        if extension == ".csv":
+            yield from enumerate(csv.DictReader(f), start=1)
+        elif extension == ".jsonl":
+            yield from ((number, json.loads(line)) for number, line in enumerate(f, start=1) if line.strip())
+        else:
+            yield from enumerate(json.load(f), start=1)
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_batch(rows, report, seen_urls, processes=None):
+    """
+    Validate, dedupe, geocode, resolve timezones and sun times for a batch of rows and insert them with one
+    bulk_create. bulk_create skips post_save, so the create_spot_data handler doesn't enrich them a second time.
+    Rows that are invalid or can't be enriched are reported and dropped without failing the rest of the batch.
+
+    Returns:
+        list[Spot]: The created spots
+    """
+    unvalidated = [field.name for field in Spot._meta.fields if field.name not in REQUIRED_FIELDS]
+    candidates = []
+    for number, row in rows:
+        report.rows += 1
+        missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+        if missing:
+            report.fail(number, f"missing {', '.join(missing)}")
+            continue
+        try:
+            # Field lengths, so one bad row can't fail the bulk_create of the whole batch
+            _spot_from_row(row).clean_fields(exclude=unvalidated)
+        except ValidationError as e:
+            errors = "; ".join(f"{field}: {' '.join(messages)}" for field, messages in e.message_dict.items())
+            report.fail(number, f"invalid {errors}")
+            continue
+        if row["url"] in seen_urls:
+            report.duplicates += 1
+            continue
+        seen_urls.add(row["url"])
+        candidates.append((number, row))
+
+    existing = set(Spot.objects.filter(url__in=[row["url"] for _, row in candidates]).values_list("url", flat=True))
+    report.duplicates += sum(row["url"] in existing for _, row in candidates)
+    candidates = [(number, row) for number, row in candidates if row["url"] not in existing]
+
+    places = geocode_many((row["major_city"], row["country"], row["postal_code"]) for _, row in candidates)
+    located = []
+    for number, row in candidates:
+        location = places[(row["major_city"], row["country"], str(row["postal_code"]))]
+        if location is None:
+            report.fail(number, "location not found")
+            continue
+        located.append((number, row, location))
+
+    zones = timezones_at(location for _, _, location in located)
+    spots = []
+    for number, row, (lat, lng) in located:
+        zone = zones[(lat, lng)]
+        if zone is None:
+            report.fail(number, "timezone not found")
+            continue
+        spots.append((number, _spot_from_row(row, lat=lat, lng=lng, timezone=zone)))
+
+    try:
+        precompute_sun_times(
+            ((spot.lat, spot.lng, spot.timezone) for _, spot in spots),
+            days=NEW_SPOT_SUN_WINDOW_DAYS,
+            processes=processes,
+        )
+    except Exception as e:
+        # Left to set_sun_times spot by spot, so only the spots that fail are dropped
+        LOGGER.error(f"ERROR precomputing sun times: {e}")
+    enriched = []
+    for number, spot in spots:
+        try:
+            set_sun_times(spot)
+        except Exception as e:
+            report.fail(number, f"sun times failed: {e}")
+            continue
+        enriched.append(spot)
+
+    with transaction.atomic():
+        spots = Spot.objects.bulk_create(enriched)
+        save_sun_windows(spots, days=NEW_SPOT_SUN_WINDOW_DAYS)
+    report.created += len(spots)
+    return spots
+
+
+def import_spots(rows, batch_size=DEFAULT_IMPORT_BATCH_SIZE, processes=None):
+    """
+    Import spots through the batched enrichment pipeline.
+
+    Args:
+        rows (Iterable[tuple[int, dict]]): Numbered rows, see read_spot_rows
+        batch_size (int, optional):
+            Defaults to DEFAULT_IMPORT_BATCH_SIZE.
+        processes (int, optional):
+            Compute sun times across a process pool of this size.
+
+    Returns:
+        ImportReport
+    """
+    report = ImportReport()
+    seen_urls = set()
+    for batch in _batches(rows, batch_size):
+        import_batch(batch, report, seen_urls, processes)
+        LOGGER.info(f"Imported {report.created} spots from {report.rows} rows ({report.rows_per_second:.0f} rows/s)")
+    return report
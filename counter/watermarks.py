@@ -0,0 +1,64 @@
+"""
+Id watermarks for incremental readers. Ids are drawn from the sequence when a row is inserted, not when its
+transaction commits, so a reader that only remembers the highest id it has seen skips any lower id that commits
+later. committed_id_bound gives the highest id up to which the table won't change any more.
+"""
+import logging
+import time
+
+from django.db import connection
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_SETTLE_TIMEOUT = 30
+POLL_INTERVAL = 0.05
+
+# Every transaction holds an exclusive lock on its own xid until it ends, including prepared ones.
+# pg_locks covers the whole cluster, so only transactions in this database are kept.
+RUNNING_XIDS_SQL = """
+SELECT coalesce(array_agg(l.transactionid::text), '{}') FROM pg_locks l
+LEFT JOIN pg_stat_activity a ON a.pid = l.pid
+LEFT JOIN pg_prepared_xacts p ON p.transaction = l.transactionid
+WHERE l.locktype = 'transactionid' AND l.mode = 'ExclusiveLock' AND l.granted
+    AND l.pid IS DISTINCT FROM pg_backend_pid()
+    AND coalesce(a.datname, p.database) = current_database()
+"""
+
+
+def committed_id_bound(model, timeout=DEFAULT_SETTLE_TIMEOUT):
+    """
+    The highest id of a model's table below which no more rows can commit.
+
+    The id sequence is read first, then the transactions still in progress, and those are waited on: any
+    row with an id up to the sequence value was inserted by one of them or by a transaction that already ended.
+    The caller's own transaction is not waited on.
+    Long running writers only hold the bound back for as long as timeout.
+
+    Args:
+        model (Model): A model with a serial id
+        timeout (float, optional):
+            Defaults to DEFAULT_SETTLE_TIMEOUT.
+            Seconds to wait for the transactions in progress to end.
+
+    Returns:
+        int | None: None when no id was handed out yet or a transaction didn't end in time
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_sequence_last_value(pg_get_serial_sequence(%s, 'id'))", [table])
+        bound = cursor.fetchone()[0]
+        if bound is None:
+            return None
+        cursor.execute(RUNNING_XIDS_SQL)
+        running = cursor.fetchone()[0]
+        deadline = time.monotonic() + timeout
+        while running:
+            cursor.execute(f"{RUNNING_XIDS_SQL} AND l.transactionid::text = ANY(%s)", [running])
+            running = cursor.fetchone()[0]
+            if not running:
+                break
+            if time.monotonic() >= deadline:
+                LOGGER.warning(f"Transactions {running} still in progress, {table} ids up to {bound} aren't settled")
+                return None
+            time.sleep(POLL_INTERVAL)
+    return bound
@@ -1,23 +1,18 @@
-from airflow.models import Variable
+from settings.database import database_settings
+from settings.variables import variable
 
 USE_TZ = True
 TIMEZONE_ZONE = "UTC"
 
 
+# Connections are kept open between the queries of a task, set DATABASE_POOL to "pgbouncer" behind PgBouncer
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.postgresql",
-        "NAME": Variable.get("DATABASE_NAME"),
-        "USER": Variable.get("DATABASE_USER"),
-        "PASSWORD": Variable.get("DATABASE_PASSWORD"),
-        "HOST": Variable.get("DATABASE_HOST"),
-        "PORT": Variable.get("DATABASE_PORT"),
-    }
+    "default": database_settings(variable, pool="persistent"),
 }
 INSTALLED_APPS = ("counter",)
 
 
-SECRET_KEY = Variable.get("SECRET_KEY")
+SECRET_KEY = variable("SECRET_KEY")
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 
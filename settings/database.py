@@ -0,0 +1,63 @@
+"""
+Shared database configuration of the settings profiles.
+
+DATABASE_POOL selects how connections are reused:
+    "none": A new connection per request or task, Django's default.
+    "persistent": Keep connections open for DATABASE_CONN_MAX_AGE seconds.
+    "pgbouncer": Persistent connections to a PgBouncer in transaction pooling mode. Server side cursors
+        don't survive across pooled transactions, so they are disabled and chunked reads like
+        counter.export and counter.analytics fall back to client side cursors.
+"""
+
+DATABASE_POOL_MODES = ("none", "persistent", "pgbouncer")
+REQUIRED_SETTINGS = ("DATABASE_NAME", "DATABASE_USER", "DATABASE_PASSWORD", "DATABASE_HOST", "DATABASE_PORT")
+DEFAULT_CONN_MAX_AGE = 300
+DEFAULT_CONNECT_TIMEOUT = 5
+
+
+def database_settings(get, pool="persistent"):
+    """
+    Build the default DATABASES entry.
+
+    Args:
+        get (Callable[[str, object], object]):
+            Setting lookup taking a name and an optional default, e.g. os.environ.get.
+            Required settings are looked up without a default.
+        pool (str, optional):
+            Defaults to persistent.
+            Pool mode used when DATABASE_POOL isn't set, one of DATABASE_POOL_MODES.
+
+    Returns:
+        dict
+
+    Raises:
+        KeyError: If a REQUIRED_SETTINGS name is not set
+    """
+    required = {name: get(name) for name in REQUIRED_SETTINGS}
+    missing = [name for name, value in required.items() if value is None]
+    if missing:
+        raise KeyError(f"{', '.join(missing)} not set")
+
+    pool = get("DATABASE_POOL", None) or pool
+    if pool not in DATABASE_POOL_MODES:
+        raise ValueError(f"Unknown DATABASE_POOL {pool}, expected one of {DATABASE_POOL_MODES}")
+
+    database = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": required["DATABASE_NAME"],
+        "USER": required["DATABASE_USER"],
+        "PASSWORD": required["DATABASE_PASSWORD"],
+        "HOST": required["DATABASE_HOST"],
+        "PORT": required["DATABASE_PORT"],
+        "CONN_MAX_AGE": 0,
+        "OPTIONS": {
+            "connect_timeout": int(get("DATABASE_CONNECT_TIMEOUT", None) or DEFAULT_CONNECT_TIMEOUT),
+        },
+    }
+    if pool != "none":
+        database["CONN_MAX_AGE"] = int(get("DATABASE_CONN_MAX_AGE", None) or DEFAULT_CONN_MAX_AGE)
+        # Detect connections dropped by a firewall or the server while they sit idle between uses
+        database["OPTIONS"].update(keepalives=1, keepalives_idle=60, keepalives_interval=10, keepalives_count=3)
+    if pool == "pgbouncer":
+        database["DISABLE_SERVER_SIDE_CURSORS"] = True
+    return database
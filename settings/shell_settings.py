@@ -2,20 +2,16 @@ import os
 
 from dotenv import load_dotenv
 
+from settings.database import database_settings
+
 USE_TZ = True
 TIMEZONE_ZONE = "UTC"
 
 load_dotenv(".env")
 
+# Connections are kept open between requests, set DATABASE_POOL to "pgbouncer" behind PgBouncer
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.postgresql",
-        "NAME": os.environ["DATABASE_NAME"],
-        "USER": os.environ["DATABASE_USER"],
-        "PASSWORD": os.environ["DATABASE_PASSWORD"],
-        "HOST": os.environ["DATABASE_HOST"],
-        "PORT": os.environ["DATABASE_PORT"],
-    }
+    "default": database_settings(os.environ.get, pool="persistent"),
 }
 INSTALLED_APPS = [
     "django.contrib.auth",
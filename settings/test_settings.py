@@ -1,17 +1,12 @@
 import os
 
+from settings.database import database_settings
+
 USE_TZ = True
 TIMEZONE_ZONE = "UTC"
 
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.postgresql_psycopg2",
-        "NAME": os.environ["DATABASE_NAME"],
-        "USER": os.environ["DATABASE_USER"],
-        "PASSWORD": os.environ["DATABASE_PASSWORD"],
-        "HOST": os.environ["DATABASE_HOST"],
-        "PORT": os.environ["DATABASE_PORT"],
-    }
+    "default": database_settings(os.environ.get, pool="none"),
 }
 
 INSTALLED_APPS = ("counter",)
@@ -22,3 +17,11 @@ DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 AGGREGATION_DATAPOINT_TIME_INTERVAL = 5
 AVERAGE_DATAPOINT_TIME_INTERVAL = 30
+
+# Spot geocoding: "on_commit", "deferred" (run Spot.objects.enrich_pending()) or "sync"
+# Tests run inside a transaction that never commits, so spots are enriched on save
+SPOT_ENRICHMENT = "sync"
+# Offline stand-ins, so the suite needs no network, see counter.fakes
+SPOT_GEOCODER = "counter.fakes.FakeGeocoder"
+SPOT_TIMEZONE_FINDER = "counter.fakes.FakeTimezoneFinder"
+CAM_PROBER = "counter.fakes.FakeCamProber"
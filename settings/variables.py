@@ -0,0 +1,47 @@
+"""
+Airflow Variable lookups for the airflow settings profile.
+
+Every Variable.get is a round trip to the Airflow metastore. Settings are read from one JSON Variable,
+SURFSIGHT_SETTINGS, with a single lookup per process. Without it, each required setting falls back to its
+own Variable, while optional settings keep their defaults rather than costing a round trip each.
+"""
+import functools
+
+SETTINGS_VARIABLE = "SURFSIGHT_SETTINGS"
+
+_MISSING = object()
+
+
+@functools.lru_cache(maxsize=None)
+def _bundle():
+    from airflow.models import Variable
+
+    return Variable.get(SETTINGS_VARIABLE, default_var=None, deserialize_json=True)
+
+
+def variable(name, default=_MISSING):
+    """
+    Read a setting from the SURFSIGHT_SETTINGS bundle, or its own Variable when there is no bundle.
+    Settings with a default are only read from the bundle.
+
+    Raises:
+        KeyError: If the setting is not set and no default was given
+    """
+    bundle = _bundle()
+    if bundle is not None:
+        if name in bundle:
+            return bundle[name]
+    elif default is _MISSING:
+        from airflow.models import Variable
+
+        value = Variable.get(name, default_var=_MISSING)
+        if value is not _MISSING:
+            return value
+    if default is _MISSING:
+        raise KeyError(f"Airflow Variable {name} is not set")
+    return default
+
+
+def clear_cache():
+    """Forget the SURFSIGHT_SETTINGS bundle, so a changed Variable is read again"""
+    _bundle.cache_clear()
@@ -0,0 +1,23 @@
+import pytest
+
+from counter.budgets import QueryBudget
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Build QueryBudget context managers. Exceeding one fails the test with every statement the block ran:
+
+        with query_budget("rollup.average_all"):
+            Spot.objects.average_all()
+    """
+    return QueryBudget
+
+
+@pytest.fixture
+def spot_cache_cold():
+    """Empty the spot metadata cache, so budgets include its load"""
+    from counter.cache import spot_cache
+
+    spot_cache.invalidate()
+    yield spot_cache
@@ -15,6 +15,7 @@ spot_params = {
 }
 
 
+# test_settings point geocoding, timezones and cam probes at counter.fakes, so no factory touches the network
 @pytest.mark.django_db
 def create_spot():
     spot = Spot.objects.create(**spot_params)
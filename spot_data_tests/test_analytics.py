@@ -0,0 +1,68 @@
+import django
+
+django.setup()
+
+import datetime
+
+import numpy as np
+import pytest
+import pytz
+
+from counter.analytics import (
+    HEATMAP_SHAPE,
+    crowd_heatmap,
+    datapoint_arrays,
+    grouped_percentiles,
+    spot_count_histograms,
+    spot_count_stats,
+)
+from counter.models import AverageDataPoint, DetectionDataPoint
+
+from .factories import create_spot
+
+
+def test_grouped_percentiles():
+    groups = np.array([0, 0, 0, 0, 2, 2, 2])
+    values = np.array([4, 1, 3, 2, 10, 30, 20])
+
+    result = grouped_percentiles(groups, values, 3, q=(50, 90))
+
+    expected = [np.percentile([1, 2, 3, 4], [50, 90]), [np.nan, np.nan], np.percentile([10, 20, 30], [50, 90])]
+    np.testing.assert_allclose(result, expected)
+
+
+@pytest.mark.django_db
+def test_spot_stats():
+    spots = [create_spot(), create_spot()]
+    for spot, counts in zip(spots, ([1, 2, 3, 10], [5])):
+        DetectionDataPoint.objects.bulk_create([DetectionDataPoint(spot=spot, count=count) for count in counts])
+
+    data = datapoint_arrays(DetectionDataPoint.objects.all(), chunk_size=2)
+    assert sorted(data["count"]) == [1, 2, 3, 5, 10]
+    assert data["timestamp"].dtype == np.int64
+
+    spot_ids, stats = spot_count_stats(DetectionDataPoint.objects.all())
+    assert list(spot_ids) == sorted(spot.pk for spot in spots)
+    np.testing.assert_allclose(stats["mean"], [4, 5])
+    np.testing.assert_allclose(stats["percentiles"][:, 0], [2.5, 5])
+
+    _, histograms = spot_count_histograms(DetectionDataPoint.objects.all(), bins=[0, 5, 10])
+    assert histograms.tolist() == [[3, 1], [0, 1]]
+
+
+@pytest.mark.django_db
+def test_crowd_heatmap():
+    spot = create_spot()
+    # Saturday 2022-08-06 08:00 in San Clemente
+    timestamp = pytz.timezone(spot.timezone).localize(datetime.datetime(2022, 8, 6, 8))
+    AverageDataPoint.objects.bulk_create(
+        [AverageDataPoint(spot=spot, count=count, timestamp=timestamp) for count in (10, 20, 30)]
+    )
+
+    heatmap = crowd_heatmap(spot)
+
+    assert heatmap["mean"].shape == HEATMAP_SHAPE
+    assert heatmap["samples"][7, 5, 8] == 3
+    assert heatmap["mean"][7, 5, 8] == 20
+    assert heatmap["samples"].sum() == 3
+    assert np.isnan(heatmap["median"][0, 0, 0])
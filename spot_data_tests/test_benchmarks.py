@@ -0,0 +1,20 @@
+import django
+
+django.setup()
+
+import pytest
+
+from benchmarks.compare import compare
+from benchmarks.run import parse_scales, run_scale
+
+
+@pytest.mark.django_db
+def test_run_scale():
+    results = run_scale(parse_scales("3x20")[0], repeat=1, ingest_batch=2)
+
+    by_name = {result["name"]: result for result in results}
+    assert by_name["aggregate_all"]["scale"]["rows"]["DetectionDataPoint"] == 60
+    assert all(result["median"] >= 0 and result["queries"] > 0 for result in results)
+
+    before = {(result["name"], 3, 20): result for result in results}
+    assert all(ratio == 1 for *_, ratio in compare(before, before))
@@ -0,0 +1,72 @@
+import django
+
+django.setup()
+
+import pytest
+
+from counter.budgets import DEFAULT_QUERY_BUDGETS, QueryBudget, QueryBudgetExceeded
+from counter.enums import SurfQualityRating
+from counter.forecast import refresh_crowd_forecasts
+from counter.ingest import ingest_detections
+from counter.models import AverageDataPoint, DetectionDataPoint, Spot, SurfQualityDataPoint
+
+from .factories import create_spot
+
+
+def operations(spots):
+    queryset = Spot.objects.all()
+    spot = spots[0]
+    return {
+        "ingest.detections": lambda: ingest_detections([(spot, None, 3) for spot in spots] * 3),
+        "rollup.aggregate_all": queryset.aggregate_all,
+        "rollup.average_all": queryset.average_all,
+        "rollup.rebuild_hourly_averages": queryset.rebuild_hourly_averages,
+        "rollup.refresh_crowd_forecasts": refresh_crowd_forecasts,
+        "spot.active": lambda: (Spot.objects.update(cam_next_check_at=None), list(Spot.objects.active())),
+        "spot.snapshot": lambda: list(queryset.snapshot()),
+        "spot.update_all_times": queryset.update_all_times,
+        "spot.update_times": spot.update_times,
+        "spot.aggregate_datapoints": spot.aggregate_datapoints,
+        "spot.average_aggregated_datapoints": spot.average_aggregated_datapoints,
+        "spot.update_hourly_averages": lambda: list(spot.update_hourly_averages()),
+        "spot.create": create_spot,
+        "datapoint.create_average": lambda: AverageDataPoint.objects.create(spot=spot, count=1),
+        "datapoint.create_detection": lambda: DetectionDataPoint.objects.create(spot=spot, count=1),
+        "datapoint.create_surf_quality": lambda: SurfQualityDataPoint.objects.create(
+            spot=spot, rating=SurfQualityRating.GOOD
+        ),
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("spot_count", [1, 6])
+def test_query_budgets(spot_count, query_budget, spot_cache_cold):
+    spots = [create_spot() for _ in range(spot_count)]
+    ops = operations(spots)
+    assert ops.keys() == DEFAULT_QUERY_BUDGETS.keys()
+
+    # In order, so the rollups have datapoints to work on
+    for name, operation in ops.items():
+        spot_cache_cold.invalidate()
+        with query_budget(name):
+            operation()
+
+
+@pytest.mark.django_db
+def test_query_budget_exceeded():
+    spots = [create_spot() for _ in range(3)]
+
+    with pytest.raises(QueryBudgetExceeded) as error:
+        with QueryBudget("spot.update_times"):
+            for spot in spots:
+                spot.update_times()
+
+    report = str(error.value)
+    assert report.startswith("Query budget of spot.update_times exceeded: 6 queries, budget 2")
+    assert 'UPDATE "counter_spot"' in report
+
+    @QueryBudget(max_queries=1, max_seconds=60)
+    def count():
+        return Spot.objects.count()
+
+    assert count() == count() == 3
@@ -0,0 +1,49 @@
+import django
+
+django.setup()
+
+import pytest
+import pytz
+
+from counter.cache import spot_cache
+from counter.models import Spot
+
+from .factories import create_spot
+
+
+@pytest.mark.django_db
+def test_spot_cache(django_assert_num_queries):
+    spot = create_spot()
+    spot_cache.invalidate()
+
+    with django_assert_num_queries(1):
+        meta = spot_cache.get(spot.pk)
+        assert spot_cache.get(spot.pk) is meta
+    assert meta.tz == pytz.timezone(spot.timezone)
+    assert (meta.lat, meta.lng, meta.enabled) == (spot.lat, spot.lng, True)
+
+    spot.timezone = "UTC"
+    spot.save()
+    assert spot_cache.timezone(spot.pk) == pytz.utc
+
+    assert spot_cache.get(-1) is None
+
+
+@pytest.mark.django_db
+def test_spot_cache_misses(django_assert_num_queries):
+    spot = create_spot()
+    Spot.objects.filter(pk=spot.pk).update(timezone=None)
+    spot_cache.invalidate()
+    spot_cache.load()
+
+    # Unknown and unlocated spots are looked up once
+    with django_assert_num_queries(1):
+        assert spot_cache.get(-1) is None
+        assert spot_cache.get(-1) is None
+    with django_assert_num_queries(1):
+        assert spot_cache.get(spot.pk) is None
+        assert spot_cache.get(spot.pk) is None
+
+    spot.timezone = "UTC"
+    spot.save()
+    assert spot_cache.timezone(spot.pk) == pytz.utc
@@ -0,0 +1,111 @@
+import django
+
+django.setup()
+
+import pytest
+from django.db import connections
+from django.test import override_settings
+
+from counter import cams
+from counter.fakes import FakeCamProber, FakeCamServer
+from counter.models import Spot
+
+from .factories import create_spot
+
+
+def test_probe_cam():
+    with FakeCamServer(allow_head=False, down={"flat"}) as server:
+        assert cams.probe_cam(server.url("lowers"))
+        assert not cams.probe_cam(server.url("flat"))
+    assert not cams.probe_cam(None)
+    assert not cams.probe_cam("http://127.0.0.1:9/playlist.m3u8", timeout=1)
+
+
+@pytest.mark.django_db
+@override_settings(CAM_PROBER="counter.cams.HttpCamProber")
+def test_check_cams_http():
+    spots = [create_spot() for _ in range(6)]
+    with FakeCamServer(latency=0.05, down={"cam0"}, failure_rate=0.2, seed=1) as server:
+        for i, spot in enumerate(spots):
+            Spot.objects.filter(pk=spot.pk).update(url=server.url(f"cam{i}"))
+        changed = cams.check_cams(Spot.objects.all(), concurrency=6, timeout=2)
+
+    assert server.requests == len(spots)
+    assert spots[0].pk in {spot.pk for spot in changed}
+    assert not Spot.objects.get(pk=spots[0].pk).enabled
+    assert Spot.objects.filter(enabled=False).count() == len(changed)
+
+
+@pytest.mark.django_db
+def test_check_cams(monkeypatch):
+    up, down = create_spot(), create_spot()
+    Spot.objects.filter(pk=down.pk).update(url="http://down")
+    monkeypatch.setattr(cams, "_prober", FakeCamProber(down={"http://down"}))
+
+    changed = cams.check_cams(Spot.objects.all())
+
+    assert [spot.pk for spot in changed] == [down.pk]
+    assert Spot.objects.get(pk=up.pk).enabled
+    assert not Spot.objects.get(pk=down.pk).enabled
+
+
+@pytest.mark.django_db
+def test_check_cams_closes_worker_connections(monkeypatch):
+    spots = [create_spot() for _ in range(3)]
+    worker_connections = []
+
+    class DatabaseProber:
+        def probe(self, url, session, timeout):
+            # A probe that touches the database from its worker thread
+            worker = connections["default"]
+            with worker.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            worker_connections.append(worker)
+            return True
+
+    monkeypatch.setattr(cams, "_prober", DatabaseProber())
+
+    assert cams.check_cams(Spot.objects.all(), concurrency=2, batch_size=2) == []
+
+    assert len(worker_connections) == len(spots)
+    assert all(worker.connection is None for worker in worker_connections)
+    assert Spot.objects.filter(cam_checked_at__isnull=False).count() == len(spots)
+
+
+@pytest.mark.django_db
+def test_check_cams_prober_errors(monkeypatch):
+    up, broken = create_spot(), create_spot()
+    Spot.objects.filter(pk=broken.pk).update(url="http://broken")
+
+    class BrokenProber:
+        def probe(self, url, session, timeout):
+            if url == "http://broken":
+                raise RuntimeError("unexpected playlist")
+            return True
+
+    monkeypatch.setattr(cams, "_prober", BrokenProber())
+
+    assert [spot.pk for spot in cams.check_cams(Spot.objects.all())] == [broken.pk]
+    assert Spot.objects.get(pk=up.pk).cam_checked_at is not None
+    assert not Spot.objects.get(pk=broken.pk).enabled
+
+
+@override_settings(CAM_CHECK_TTL=60, CAM_CHECK_MAX_BACKOFF=300)
+def test_next_check_delay():
+    assert [cams.next_check_delay(failures) for failures in range(6)] == [60, 60, 120, 240, 300, 300]
+
+
+@pytest.mark.django_db
+def test_cam_status_cached(monkeypatch):
+    spot = create_spot()
+    prober = FakeCamProber(down={spot.url})
+    monkeypatch.setattr(cams, "_prober", prober)
+
+    Spot.objects.active()
+    Spot.objects.active()
+
+    assert len(prober.probed) == 1
+    spot.refresh_from_db()
+    assert spot.cam_failures == 1
+    assert spot.cam_next_check_at > spot.cam_checked_at
+    assert not Spot.objects.stale_cams().exists()
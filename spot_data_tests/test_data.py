@@ -2,9 +2,12 @@ import django
 
 django.setup()
 
+import datetime
+
 import pytest
+from django.utils import timezone
 
-from counter.enums import HourIdentifierEnum, MonthIdentifierEnum, SurfQualityRating
+from counter.enums import DayIdentifierEnum, HourIdentifierEnum, MonthIdentifierEnum, SurfQualityRating
 from counter.models import (
     SurfQualityDataPoint,
     AggregateDataPoint,
@@ -14,7 +17,7 @@ from counter.models import (
     Spot,
 )
 
-from .factories import create_data
+from .factories import create_data, create_spot
 
 
 @pytest.mark.django_db
@@ -35,3 +38,79 @@ def test_data():
     assert SurfQualityDataPoint.objects.first()
     assert isinstance(SurfQualityDataPoint.objects.first().rating, SurfQualityRating)
     assert isinstance(SurfQualityDataPoint.objects.first().hour_id, HourIdentifierEnum)
+
+
+@pytest.mark.django_db
+def test_rollup_all():
+    spots = [create_spot(), create_spot()]
+    for spot, counts in zip(spots, ([3, 9, 5], [12, 2])):
+        for count in counts:
+            DetectionDataPoint.objects.create(spot=spot, count=count)
+
+    aggregates = Spot.objects.aggregate_all()
+    assert sorted((a.spot_id, a.count) for a in aggregates) == [(spots[0].pk, 9), (spots[1].pk, 12)]
+
+    AggregateDataPoint.objects.create(spot=spots[0], count=4)
+    averages = Spot.objects.average_all()
+    assert sorted((a.spot_id, a.count) for a in averages) == [(spots[0].pk, 6), (spots[1].pk, 12)]
+    assert all(isinstance(a.hour_id, HourIdentifierEnum) for a in averages)
+    assert AverageDataPoint.objects.filter(hour_id__isnull=True).count() == 0
+
+
+@pytest.mark.django_db
+def test_time_info_single_write(django_assert_num_queries):
+    spot = create_spot()
+    AverageDataPoint.objects.create(spot=spot, count=1)
+
+    # The spot timezone is cached, so each create is a single INSERT plus the hourly bucket
+    # or current surf quality update
+    with django_assert_num_queries(4):
+        average = AverageDataPoint.objects.create(spot=spot, count=2)
+        quality = SurfQualityDataPoint.objects.create(spot=spot, rating=SurfQualityRating.GOOD)
+    assert isinstance(average.hour_id, HourIdentifierEnum)
+    assert isinstance(quality.month_id, MonthIdentifierEnum)
+
+    with django_assert_num_queries(2):
+        points = SurfQualityDataPoint.objects.bulk_create(
+            [SurfQualityDataPoint(spot=spot, rating=SurfQualityRating.POOR) for _ in range(3)]
+        )
+    assert all(isinstance(p.day_id, DayIdentifierEnum) for p in points)
+
+
+@pytest.mark.django_db
+def test_hourly_averages_incremental():
+    spot = create_spot()
+    timestamp = timezone.now()
+    for count in (4, 8, 9):
+        AverageDataPoint.objects.create(spot=spot, count=count, timestamp=timestamp)
+    AverageDataPoint.objects.bulk_create([AverageDataPoint(spot=spot, count=3, timestamp=timestamp)])
+
+    hourly = HourlyAverageDataPoint.objects.get(spot=spot)
+    assert (hourly.count_sum, hourly.sample_count, hourly.count) == (24, 4, 6)
+
+    HourlyAverageDataPoint.objects.filter(spot=spot).update(count_sum=0, sample_count=0, count=0)
+    spot.update_hourly_averages()
+    hourly.refresh_from_db()
+    assert (hourly.count_sum, hourly.sample_count, hourly.count) == (24, 4, 6)
+
+    # Buckets whose AverageDataPoints are all gone are removed by the rebuild
+    empty_hour = HourIdentifierEnum((hourly.hour_id.value + 1) % 24)
+    HourlyAverageDataPoint.objects.create(spot=spot, hour_id=empty_hour, count_sum=5, sample_count=1, count=5)
+    spot.update_hourly_averages()
+    hours = HourlyAverageDataPoint.objects.filter(spot=spot).values_list("hour_id", flat=True)
+    assert list(hours) == [hourly.hour_id]
+
+
+@pytest.mark.django_db
+def test_time_range_queries():
+    spots = [create_spot(), create_spot()]
+    now = timezone.now()
+    for spot in spots:
+        for minutes in (30, 20, 10):
+            DetectionDataPoint.objects.create(spot=spot, count=minutes, timestamp=now - datetime.timedelta(minutes=minutes))
+
+    recent = DetectionDataPoint.objects.for_spot_since(spots[0], now - datetime.timedelta(minutes=25))
+    assert [point.count for point in recent] == [10, 20]
+
+    latest = DetectionDataPoint.objects.latest_for_spots(spots)
+    assert sorted((point.spot_id, point.count) for point in latest) == [(spots[0].pk, 10), (spots[1].pk, 10)]
@@ -0,0 +1,74 @@
+import sys
+import types
+
+import pytest
+
+from settings import variables
+from settings.database import database_settings
+
+ENVIRONMENT = {
+    "DATABASE_NAME": "surfsight",
+    "DATABASE_USER": "surfsight",
+    "DATABASE_PASSWORD": "secret",
+    "DATABASE_HOST": "localhost",
+    "DATABASE_PORT": "5432",
+}
+
+
+def test_database_settings():
+    assert database_settings(ENVIRONMENT.get, pool="none")["CONN_MAX_AGE"] == 0
+
+    persistent = database_settings({**ENVIRONMENT, "DATABASE_CONN_MAX_AGE": "60"}.get)
+    assert persistent["CONN_MAX_AGE"] == 60
+    assert "DISABLE_SERVER_SIDE_CURSORS" not in persistent
+
+    pgbouncer = database_settings({**ENVIRONMENT, "DATABASE_POOL": "pgbouncer"}.get, pool="none")
+    assert pgbouncer["CONN_MAX_AGE"] > 0 and pgbouncer["DISABLE_SERVER_SIDE_CURSORS"]
+
+    with pytest.raises(ValueError):
+        database_settings({**ENVIRONMENT, "DATABASE_POOL": "pooled"}.get)
+    with pytest.raises(KeyError):
+        database_settings({"DATABASE_NAME": "surfsight"}.get)
+
+
+def fake_variables(monkeypatch, values):
+    lookups = []
+
+    class Variable:
+        @classmethod
+        def get(cls, key, default_var=None, deserialize_json=False):
+            lookups.append(key)
+            return values.get(key, default_var)
+
+    monkeypatch.setitem(sys.modules, "airflow", types.ModuleType("airflow"))
+    monkeypatch.setitem(sys.modules, "airflow.models", types.SimpleNamespace(Variable=Variable))
+    variables.clear_cache()
+    return lookups
+
+
+def test_bundled_variables(monkeypatch):
+    bundle = {**ENVIRONMENT, "SECRET_KEY": "key", "DATABASE_POOL": "pgbouncer"}
+    lookups = fake_variables(monkeypatch, {variables.SETTINGS_VARIABLE: bundle, "DATABASE_CONN_MAX_AGE": "60"})
+    try:
+        database = database_settings(variables.variable)
+        assert variables.variable("SECRET_KEY") == "key"
+        assert database["DISABLE_SERVER_SIDE_CURSORS"]
+        # Names missing from the bundle take their default, they aren't looked up on their own
+        assert database["CONN_MAX_AGE"] != 60
+        with pytest.raises(KeyError):
+            variables.variable("SPOT_ENRICHMENT")
+        assert lookups == [variables.SETTINGS_VARIABLE]
+    finally:
+        variables.clear_cache()
+
+
+def test_unbundled_variables(monkeypatch):
+    lookups = fake_variables(monkeypatch, {**ENVIRONMENT, "SECRET_KEY": "key", "DATABASE_POOL": "pgbouncer"})
+    try:
+        database = database_settings(variables.variable)
+        assert variables.variable("SECRET_KEY") == "key"
+        # Optional settings keep their defaults without a round trip each
+        assert "DISABLE_SERVER_SIDE_CURSORS" not in database
+        assert lookups == [variables.SETTINGS_VARIABLE, *ENVIRONMENT, "SECRET_KEY"]
+    finally:
+        variables.clear_cache()
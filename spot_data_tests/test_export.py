@@ -0,0 +1,90 @@
+import django
+
+django.setup()
+
+import csv
+import datetime
+import gzip
+import os
+
+import pytest
+from django.utils import timezone
+
+from counter import export
+from counter.export import export_datapoints, read_watermark
+from counter.models import DetectionDataPoint
+
+from .factories import create_spot
+
+
+def read_rows(path):
+    with gzip.open(path, "rt", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.mark.django_db
+def test_export_csv(tmp_path):
+    spots = [create_spot(), create_spot()]
+    day = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0) - datetime.timedelta(days=2)
+    DetectionDataPoint.objects.bulk_create(
+        [
+            DetectionDataPoint(spot=spot, count=i, timestamp=day + datetime.timedelta(hours=hours, minutes=i))
+            for spot in spots
+            for hours in (0, 24)
+            for i in range(3)
+        ]
+    )
+
+    result = export_datapoints(DetectionDataPoint, tmp_path, chunk_size=2)
+
+    assert result["rows"] == 12
+    assert len(result["files"]) == 4
+    assert read_watermark(tmp_path, DetectionDataPoint) == result["watermark"]
+    path = os.path.join(
+        tmp_path, "counter_detectiondatapoint", f"spot_id={spots[0].pk}", f"date={day.date().isoformat()}"
+    )
+    rows = read_rows(os.path.join(path, os.listdir(path)[0]))
+    assert [row["count"] for row in rows] == ["0", "1", "2"]
+    assert set(rows[0]) == {"id", "spot_id", "timestamp", "count"}
+
+    # Only rows past the watermark are exported next time, including late rows with an old timestamp
+    DetectionDataPoint.objects.create(spot=spots[0], count=7, timestamp=day)
+    incremental = export_datapoints(DetectionDataPoint, tmp_path, after_id=result["watermark"])
+    assert incremental["rows"] == 1
+    assert [row["count"] for row in read_rows(incremental["files"][0])] == ["7"]
+    assert export_datapoints(DetectionDataPoint, tmp_path, after_id=incremental["watermark"])["rows"] == 0
+
+
+@pytest.mark.django_db
+def test_failed_export_leaves_no_files(tmp_path, monkeypatch):
+    spots = [create_spot(), create_spot()]
+    for spot in spots:
+        DetectionDataPoint.objects.create(spot=spot, count=1)
+    write = export.CsvPartWriter.write
+    written = {}
+
+    def fail_second_partition(writer, rows):
+        if writer is not written.setdefault("first", writer):
+            raise OSError("disk full")
+        write(writer, rows)
+
+    monkeypatch.setattr(export.CsvPartWriter, "write", fail_second_partition)
+    with pytest.raises(OSError):
+        export_datapoints(DetectionDataPoint, tmp_path)
+
+    assert [files for _, _, files in os.walk(tmp_path) if files] == []
+    assert read_watermark(tmp_path, DetectionDataPoint) is None
+
+
+@pytest.mark.django_db
+def test_export_parquet(tmp_path):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    spot = create_spot()
+    DetectionDataPoint.objects.bulk_create(
+        [DetectionDataPoint(spot=spot, count=i, timestamp=timezone.now() - datetime.timedelta(hours=1)) for i in range(5)]
+    )
+
+    result = export_datapoints(DetectionDataPoint, tmp_path, export_format="parquet", chunk_size=2)
+
+    table = parquet.read_table(result["files"][0])
+    assert table.column("count").to_pylist() == list(range(5))
@@ -0,0 +1,42 @@
+import django
+
+django.setup()
+
+import datetime
+
+import pytest
+import pytz
+
+from counter.enums import SurfQualityRating
+from counter.forecast import refresh_crowd_forecasts
+from counter.models import AverageDataPoint, CrowdForecast, SurfQualityDataPoint
+
+from .factories import create_spot
+
+
+@pytest.mark.django_db
+def test_refresh_crowd_forecasts():
+    spot = create_spot()
+    # Saturday 2022-08-06 08:00 in San Clemente
+    saturday = pytz.timezone(spot.timezone).localize(datetime.datetime(2022, 8, 6, 8))
+    AverageDataPoint.objects.bulk_create(
+        [AverageDataPoint(spot=spot, count=count, timestamp=saturday) for count in (10, 20)]
+    )
+    SurfQualityDataPoint.objects.create(spot=spot, rating=SurfQualityRating.GOOD, timestamp=saturday)
+
+    refresh_crowd_forecasts()
+    forecast = CrowdForecast.objects.for_time(spot, saturday)
+    assert (forecast.sample_count, forecast.count_mean) == (2, 15)
+    assert forecast.rating_distribution()[SurfQualityRating.GOOD] == 1
+
+    # Only new rows are folded in
+    AverageDataPoint.objects.create(spot=spot, count=60, timestamp=saturday)
+    refresh_crowd_forecasts()
+    forecast.refresh_from_db()
+    assert (forecast.sample_count, forecast.count_mean) == (3, 30)
+    assert forecast.rating_good == 1
+
+    refresh_crowd_forecasts(full=True)
+    forecast = CrowdForecast.objects.for_time(spot, saturday)
+    assert (forecast.sample_count, forecast.count_mean, forecast.rating_good) == (3, 30, 1)
+    assert CrowdForecast.objects.for_time(spot, saturday + datetime.timedelta(hours=1)) is None
@@ -0,0 +1,59 @@
+import django
+
+django.setup()
+
+import io
+
+import pytest
+from django.core.management import call_command
+
+from counter import geo
+from counter.models import Spot, SunWindow
+
+
+class StaticGeocoder:
+    def geocode(self, city, country, postal_code):
+        if city == "Nowhere":
+            return None
+        if city == "Offshore":
+            return 0.0, -140.0
+        return 33.38, -117.59
+
+
+class CoastalTimezoneFinder:
+    def timezone_at(self, lng, lat):
+        return None if lng == -140.0 else "America/Los_Angeles"
+
+
+CSV = """name,major_city,country,postal_code,url
+Lowers,San Clemente,United States,92672,https://cams.example.com/lowers.m3u8
+Trestles,San Clemente,United States,92672,https://cams.example.com/trestles.m3u8
+Lowers again,San Clemente,United States,92672,https://cams.example.com/lowers.m3u8
+Lost,Nowhere,United States,00000,https://cams.example.com/lost.m3u8
+No url,San Clemente,United States,92672,
+Buoy,Offshore,United States,00000,https://cams.example.com/buoy.m3u8
+Long zip,San Clemente,United States,92672-123456,https://cams.example.com/zip.m3u8
+"""
+
+
+@pytest.mark.django_db
+def test_import_spots(tmp_path, monkeypatch):
+    monkeypatch.setattr(geo, "_geocoder", StaticGeocoder())
+    monkeypatch.setattr(geo, "_timezone_finder", CoastalTimezoneFinder())
+    path = tmp_path / "spots.csv"
+    path.write_text(CSV)
+    stdout, stderr = io.StringIO(), io.StringIO()
+
+    call_command("import_spots", str(path), "--batch-size", "2", stdout=stdout, stderr=stderr)
+
+    assert sorted(Spot.objects.values_list("name", flat=True)) == ["Lowers", "Trestles"]
+    spot = Spot.objects.get(name="Lowers")
+    assert spot.timezone == "America/Los_Angeles"
+    assert spot.sunrise and spot.sunset
+    # Today and tomorrow, until the daily sun_times job reaches the new spot
+    assert SunWindow.objects.filter(spot=spot).count() == 2
+    assert "7 rows, 2 created, 1 duplicates, 4 failed" in stdout.getvalue()
+    assert "row 4: location not found" in stderr.getvalue()
+    assert "row 5: missing url" in stderr.getvalue()
+    assert "row 6: timezone not found" in stderr.getvalue()
+    assert "row 7: invalid postal_code" in stderr.getvalue()
@@ -0,0 +1,67 @@
+import django
+
+django.setup()
+
+import datetime
+import time
+
+import pytest
+import pytz
+
+from counter import ingest
+from counter.ingest import DetectionBuffer, ingest_detections
+from counter.models import DetectionDataPoint
+
+from .factories import create_spot
+
+
+@pytest.mark.django_db
+def test_ingest_detections():
+    spot = create_spot()
+    timestamp = datetime.datetime(2022, 1, 1, 12, tzinfo=pytz.utc)
+
+    points = ingest_detections([(spot, timestamp, 4), (spot.pk, None, 7)])
+
+    assert len(points) == 2
+    assert DetectionDataPoint.objects.filter(spot=spot).count() == 2
+    assert DetectionDataPoint.objects.filter(spot=spot, timestamp=timestamp, count=4).exists()
+    assert ingest_detections([]) == []
+
+
+@pytest.mark.django_db
+def test_detection_buffer():
+    spot = create_spot()
+
+    with DetectionBuffer(max_size=3, max_age=60) as buffer:
+        assert buffer.add(spot, 1) == []
+        assert buffer.add(spot, 2) == []
+        assert len(buffer.add(spot, 3)) == 3
+        assert len(buffer) == 0
+
+        buffer.add(spot, 4)
+        assert DetectionDataPoint.objects.filter(spot=spot).count() == 3
+
+    assert DetectionDataPoint.objects.filter(spot=spot).count() == 4
+
+    buffer = DetectionBuffer(max_size=100, max_age=0)
+    assert len(buffer.add(spot, 5)) == 1
+
+
+def test_detection_buffer_flushes_when_idle(monkeypatch):
+    flushed = []
+    monkeypatch.setattr(ingest, "ingest_detections", lambda points, batch_size: flushed.append(points) or points)
+
+    buffer = DetectionBuffer(max_size=100, max_age=0.2).start()
+    try:
+        buffer.add(1, 5)
+        # No further add, the background flusher writes the point once it is max_age old
+        deadline = time.monotonic() + 5
+        while not flushed and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert [count for _, _, count in flushed[0]] == [5]
+        assert len(buffer) == 0
+
+        buffer.add(1, 6)
+    finally:
+        buffer.close()
+    assert [count for _, _, count in flushed[1]] == [6]
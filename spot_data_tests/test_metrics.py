@@ -0,0 +1,80 @@
+import django
+
+django.setup()
+
+import socket
+import time
+
+import pytest
+from django.test import override_settings
+
+from counter import metrics
+from counter.models import AverageDataPoint, Spot
+
+from .factories import create_spot
+
+
+@pytest.mark.django_db
+def test_prometheus_metrics():
+    spot = create_spot()
+
+    with override_settings(METRICS_SINKS=["counter.metrics.PrometheusSink"]):
+        AverageDataPoint.objects.create(spot=spot, count=3)
+        list(Spot.objects.active(cam_check=False))
+        sink = metrics.get_sinks()[0]
+
+    hourly = sink.histograms["signal.update_hourly_average"]
+    assert (hourly.count, hourly.queries, hourly.rows) == (1, 1, 1)
+    assert sink.histograms["spot.active"].count == 1
+    text = sink.render()
+    assert 'surfsight_call_seconds_count{name="spot.active"} 1' in text
+    assert 'surfsight_call_seconds_bucket{name="spot.active",le="+Inf"} 1' in text
+
+
+
+def test_prometheus_textfile(tmp_path):
+    path = tmp_path / "surfsight.prom"
+    with override_settings(METRICS_PROMETHEUS_INTERVAL=0.05):
+        sink = metrics.PrometheusSink(path=str(path))
+    sink.record("test.dumped", 0.01, 2, 3)
+
+    # Written by the background thread, not by record
+    deadline = time.monotonic() + 2
+    while not path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert 'surfsight_call_queries_total{name="test.dumped"} 2' in path.read_text()
+
+    sink.record("test.closed", 0.01, 1, 1)
+    sink.close()
+    assert 'surfsight_call_seconds_count{name="test.closed"} 1' in path.read_text()
+
+
+@pytest.mark.django_db
+def test_statsd_metrics():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(2)
+    spot = create_spot()
+
+    with override_settings(METRICS_SINKS=["counter.metrics.StatsdSink"], METRICS_STATSD_ADDRESS=receiver.getsockname()):
+        spot.update_times()
+
+    # Nested calls like the Spot post_save handlers are sent first
+    packets = []
+    while not packets or not packets[-1].startswith("surfsight.spot.update_times."):
+        packets.append(receiver.recv(4096).decode())
+    receiver.close()
+    assert "surfsight.spot.update_times.queries:" in packets[-1]
+    assert any(packet.startswith("surfsight.signal.invalidate_spot_cache.latency:") for packet in packets)
+
+
+def test_metrics_disabled(monkeypatch):
+    assert metrics.get_sinks() == []
+    monkeypatch.setattr(metrics, "_QueryCounter", None)
+
+    @metrics.instrument("test.disabled")
+    def double(value):
+        return value * 2
+
+    # No counter or execute wrapper is set up when there are no sinks
+    assert double(2) == 4
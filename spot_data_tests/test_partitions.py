@@ -0,0 +1,94 @@
+import django
+
+django.setup()
+
+import datetime
+
+import pytest
+from django.db import connection
+from django.utils import timezone
+
+from counter.models import DetectionDataPoint
+from counter.partitions import ensure_partitions, is_partitioned, partition_table, partitions
+from counter.retention import drop_expired_partitions
+
+from .factories import create_spot
+
+# The suite runs without migrations, so each test partitions the table the way migration 0016 does.
+# The test transaction is rolled back afterwards, DDL included.
+
+
+def partition_detections():
+    with connection.cursor() as cursor:
+        # Tables with deferred foreign key checks still pending in the transaction can't be altered
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+    partition_table("DetectionDataPoint", concurrently=False)
+
+
+@pytest.mark.django_db
+def test_partition_table():
+    spot = create_spot()
+    old = timezone.now() - datetime.timedelta(days=10)
+    DetectionDataPoint.objects.create(spot=spot, count=1, timestamp=old)
+
+    partition_detections()
+    assert is_partitioned(DetectionDataPoint)
+
+    archive, *daily = partitions(DetectionDataPoint)
+    assert archive.name == "counter_detectiondatapoint_archive"
+    assert archive.lower is None
+    assert archive.upper == (timezone.now() + datetime.timedelta(days=1)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    # Partitions cover the next 14 days
+    assert daily[-1].upper == archive.upper + datetime.timedelta(days=13)
+    assert daily[0].lower == archive.upper
+    assert all(earlier.upper == later.lower for earlier, later in zip(daily, daily[1:]))
+
+    DetectionDataPoint.objects.create(spot=spot, count=2)
+    assert DetectionDataPoint.objects.count() == 2
+    assert ensure_partitions(DetectionDataPoint) == []
+
+
+@pytest.mark.django_db
+def test_rows_past_the_partitions_move_out_of_the_default():
+    spot = create_spot()
+    partition_detections()
+
+    future = timezone.now() + datetime.timedelta(days=20)
+    DetectionDataPoint.objects.create(spot=spot, count=3, timestamp=future)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM counter_detectiondatapoint_default")
+        assert cursor.fetchone()[0] == 1
+
+    created = ensure_partitions(DetectionDataPoint, ahead=25)
+    assert f"counter_detectiondatapoint_p{future.strftime('%Y%m%d')}" in created
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM counter_detectiondatapoint_default")
+        assert cursor.fetchone()[0] == 0
+    assert DetectionDataPoint.objects.get(timestamp=future).count == 3
+
+
+@pytest.mark.django_db
+def test_drop_expired_partitions_waits_for_rollups():
+    rolled_up, pending = create_spot(), create_spot()
+    old = timezone.now() - datetime.timedelta(days=10)
+    for spot in (rolled_up, pending):
+        DetectionDataPoint.objects.create(spot=spot, count=1, timestamp=old)
+    partition_detections()
+    archive = partitions(DetectionDataPoint)[0]
+
+    read_up_to = DetectionDataPoint.objects.latest("id").id
+    # pending has rows in the archive that were never rolled up
+    watermarks = {rolled_up.pk: (archive.upper, read_up_to)}
+    assert drop_expired_partitions(DetectionDataPoint, archive.upper, watermarks) == 0
+    assert DetectionDataPoint.objects.count() == 2
+
+    # Or that arrived after the rollup read up to its watermark id
+    watermarks[pending.pk] = (archive.upper, read_up_to - 1)
+    assert drop_expired_partitions(DetectionDataPoint, archive.upper, watermarks) == 0
+
+    watermarks[pending.pk] = (archive.upper, read_up_to)
+    assert drop_expired_partitions(DetectionDataPoint, archive.upper, watermarks) == 1
+    assert partitions(DetectionDataPoint)[0].lower == archive.upper
+    assert DetectionDataPoint.objects.count() == 0
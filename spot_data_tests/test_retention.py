@@ -0,0 +1,51 @@
+import django
+
+django.setup()
+
+import datetime
+
+import pytest
+from django.test import override_settings
+from django.utils import timezone
+
+from counter.models import DetectionDataPoint, RollupCheckpoint, SunWindow
+from counter.retention import purge_expired_datapoints
+from counter.scheduler import checkpoint_name
+
+from .factories import create_spot
+
+
+@pytest.mark.django_db
+@override_settings(DATAPOINT_RETENTION_DAYS={"DetectionDataPoint": 7}, ROLLUP_SHARDS=1)
+def test_purge_only_rolled_up_rows():
+    spot = create_spot()
+    old = timezone.now() - datetime.timedelta(days=10)
+    DetectionDataPoint.objects.bulk_create([DetectionDataPoint(spot=spot, count=i, timestamp=old) for i in range(5)])
+    read_up_to = DetectionDataPoint.objects.latest("id").id
+    # Never rolled up
+    assert purge_expired_datapoints(batch_size=2) == {"DetectionDataPoint": 0, "SunWindow": 0}
+
+    # Arrived after the aggregate rollup read up to read_up_to, despite its old timestamp
+    late = DetectionDataPoint.objects.create(spot=spot, count=1, timestamp=old)
+    recent = DetectionDataPoint.objects.create(spot=spot, count=1)
+    RollupCheckpoint.objects.create(
+        name=checkpoint_name("aggregate", 0, 1), watermark=timezone.now(), watermark_id=read_up_to
+    )
+
+    assert purge_expired_datapoints(batch_size=2) == {"DetectionDataPoint": 5, "SunWindow": 0}
+    assert set(DetectionDataPoint.objects.values_list("pk", flat=True)) == {late.pk, recent.pk}
+
+
+@pytest.mark.django_db
+def test_purge_past_sun_windows():
+    spot = create_spot()
+    now = timezone.now()
+    SunWindow.objects.all().delete()
+    for days in (-3, -1, 0, 1):
+        date = now.date() + datetime.timedelta(days=days)
+        SunWindow.objects.create(spot=spot, date=date, sunrise=now, sunset=now)
+
+    assert purge_expired_datapoints()["SunWindow"] == 1
+
+    # Yesterday is still today somewhere west of UTC
+    assert SunWindow.objects.count() == 3
@@ -0,0 +1,93 @@
+import django
+
+django.setup()
+
+import datetime
+
+import pytest
+from django.db import connections
+from django.utils import timezone
+
+from counter.ingest import ingest_detections
+from counter.models import AggregateDataPoint, DetectionDataPoint
+from counter.scheduler import DONE, LOCKED, RAN, lock_key, run_rollups, run_shard, shard_spots
+
+from .factories import create_spot
+
+
+@pytest.mark.django_db
+def test_run_rollups():
+    spots = [create_spot() for _ in range(8)]
+    # The cycle rolls up the interval that ended last
+    last_interval = timezone.now() - datetime.timedelta(minutes=5)
+    ingest_detections([(spot, last_interval, 5) for spot in spots])
+
+    sharded = [set(shard_spots(shard, 3).values_list("pk", flat=True)) for shard in range(3)]
+    assert set().union(*sharded) == {spot.pk for spot in spots}
+    assert sum(map(len, sharded)) == len(spots)
+
+    results = run_rollups(shards=3, processes=1)
+    assert all(result == {"aggregate": RAN, "average": RAN, "sun_times": RAN} for result in results.values())
+    assert AggregateDataPoint.objects.count() == len(spots)
+
+    # A restarted cycle within the same intervals has nothing left to do
+    assert set(run_shard(0, 3).values()) == {DONE}
+    assert AggregateDataPoint.objects.count() == len(spots)
+
+
+@pytest.mark.django_db
+def test_run_shard_locked():
+    create_spot()
+    other = connections.create_connection("default")
+    try:
+        with other.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s, %s)", [lock_key("aggregate", 2), 1])
+        assert run_shard(1, 2, tasks=["aggregate"]) == {"aggregate": LOCKED}
+        assert run_shard(0, 2, tasks=["aggregate"]) == {"aggregate": RAN}
+    finally:
+        other.close()
+
+
+@pytest.mark.django_db
+def test_run_shard_windows():
+    spot = create_spot()
+    start = datetime.datetime(2022, 6, 1, 10, tzinfo=datetime.timezone.utc)
+    for minutes, count in ((1, 5), (6, 7), (12, 4)):
+        DetectionDataPoint.objects.create(spot=spot, count=count, timestamp=start + datetime.timedelta(minutes=minutes))
+
+    def run(minutes):
+        return run_shard(0, 1, tasks=["aggregate"], now=start + datetime.timedelta(minutes=minutes))
+
+    assert run(5.5) == {"aggregate": RAN}
+    # A restart in the same interval reads nothing twice
+    assert run(6) == {"aggregate": DONE}
+    # Intervals missed in between are each rolled up
+    assert run(16) == {"aggregate": RAN}
+    aggregates = AggregateDataPoint.objects.order_by("timestamp").values_list("timestamp", "count")
+    assert list(aggregates) == [
+        (start, 5),
+        (start + datetime.timedelta(minutes=5), 7),
+        (start + datetime.timedelta(minutes=10), 4),
+    ]
+
+
+@pytest.mark.django_db
+def test_run_shard_late_rows():
+    spot = create_spot()
+    start = datetime.datetime(2022, 6, 1, 10, tzinfo=datetime.timezone.utc)
+
+    def run(minutes):
+        return run_shard(0, 1, tasks=["aggregate"], now=start + datetime.timedelta(minutes=minutes))
+
+    def detect(minutes, count):
+        DetectionDataPoint.objects.create(spot=spot, count=count, timestamp=start + datetime.timedelta(minutes=minutes))
+
+    detect(1, 5)
+    run(5)
+    # Stamped in the first window but written after it was rolled up, e.g. by a DetectionBuffer
+    detect(4.9, 9)
+    detect(6, 7)
+    run(10)
+    run(15)
+    aggregates = AggregateDataPoint.objects.order_by("timestamp").values_list("timestamp", "count")
+    assert list(aggregates) == [(start, 5), (start + datetime.timedelta(minutes=5), 9)]
@@ -2,10 +2,16 @@ import django
 
 django.setup()
 
+import datetime
+
 import pytest
-import requests
+import pytz
+from django.utils import timezone
 
-from counter.models import Spot
+from counter import cams, geo, solar
+from counter.enums import HourIdentifierEnum, SurfQualityRating
+from counter.ingest import ingest_detections
+from counter.models import AverageDataPoint, HourlyAverageDataPoint, Spot, SunWindow, SurfQualityDataPoint
 
 from .factories import create_spot, spot_params
 
@@ -30,9 +36,127 @@ def test_spot():
     assert bool(spot.timezone)
 
     # Spot url works
-    r = requests.get(spot.url)
-    assert r.ok
+    assert cams.get_cam_prober().probe(spot.url)
 
     # Update spot sunrise and sunset times
     assert bool(spot.sunrise)
     assert bool(spot.sunset)
+
+
+@pytest.mark.django_db
+def test_update_all_times():
+    spots = [create_spot(), create_spot()]
+    Spot.objects.update(sunrise=None, sunset=None, _sunrise=None, _sunset=None)
+
+    date = datetime.date(2022, 6, 1)
+    updated = Spot.objects.update_all_times(date=date, days=3)
+
+    assert len(updated) == 2
+    for spot in spots:
+        spot.refresh_from_db()
+        assert spot._sunrise.date() == date
+        assert spot.sunrise.hour == spot._sunrise.astimezone(pytz.timezone(spot.timezone)).hour
+        assert bool(spot.sunset)
+    assert SunWindow.objects.filter(spot=spots[0], date__gte=date, date__lt=datetime.date(2022, 6, 4)).count() == 3
+    assert (spot.lat, spot.lng, date + datetime.timedelta(days=2), spot.timezone) in solar._SUN_TIMES
+
+
+@pytest.mark.django_db
+def test_update_all_times_polar():
+    polar, spot = create_spot(), create_spot()
+    Spot.objects.filter(pk=polar.pk).update(lat=78.22, lng=15.65, timezone="Arctic/Longyearbyen")
+    midsummer, midwinter = datetime.date(2022, 6, 21), datetime.date(2022, 12, 21)
+
+    Spot.objects.update_all_times(date=midsummer)
+    polar.refresh_from_db()
+    window = SunWindow.objects.get(spot=polar, date=midsummer)
+    assert window.sunset - window.sunrise > datetime.timedelta(hours=23, minutes=59)
+    assert polar.sunrise == datetime.time.min
+
+    # Polar night leaves the spot without a window, other spots are updated as usual
+    Spot.objects.update_all_times(date=midwinter)
+    polar.refresh_from_db()
+    assert polar.sunrise is None and not polar.is_active()
+    assert not SunWindow.objects.filter(spot=polar, date=midwinter).exists()
+    assert SunWindow.objects.filter(spot=spot, date=midwinter).exists()
+
+
+def test_sun_times_memo_drops_past_dates(monkeypatch):
+    monkeypatch.setattr(solar, "_SUN_TIMES", {})
+    monkeypatch.setattr(solar, "_pruned_on", None)
+    today = datetime.datetime.now(pytz.utc).date()
+    solar.sun_times(33.38, -117.59, today - datetime.timedelta(days=30), "America/Los_Angeles")
+    assert len(solar._SUN_TIMES) == 1
+
+    # The first lookup on a new day drops dates that have passed
+    monkeypatch.setattr(solar, "_pruned_on", today - datetime.timedelta(days=1))
+    solar.sun_times(33.38, -117.59, today, "America/Los_Angeles")
+    assert [key[2] for key in solar._SUN_TIMES] == [today]
+
+
+@pytest.mark.django_db
+def test_active():
+    day, night = create_spot(), create_spot()
+    now = timezone.now()
+    SunWindow.objects.all().delete()
+    SunWindow.objects.create(
+        spot=day, date=now.date(), sunrise=now - datetime.timedelta(hours=1), sunset=now + datetime.timedelta(hours=1)
+    )
+    SunWindow.objects.create(
+        spot=night, date=now.date(), sunrise=now + datetime.timedelta(hours=1), sunset=now + datetime.timedelta(hours=2)
+    )
+
+    assert list(Spot.objects.active(cam_check=False)) == [day]
+
+    Spot.objects.filter(pk=day.pk).update(enabled=False)
+    assert not Spot.objects.active(cam_check=False).exists()
+
+
+class CountingGeocoder:
+    calls = 0
+
+    def geocode(self, city, country, postal_code):
+        CountingGeocoder.calls += 1
+        return 33.38, -117.59
+
+
+@pytest.mark.django_db
+def test_deferred_enrichment(monkeypatch, settings):
+    settings.SPOT_ENRICHMENT = "deferred"
+    monkeypatch.setattr(geo, "_geocoder", CountingGeocoder())
+    CountingGeocoder.calls = 0
+
+    spots = [Spot.objects.create(**spot_params) for _ in range(3)]
+    assert all(spot.timezone is None for spot in spots)
+
+    enriched = Spot.objects.enrich_pending()
+
+    assert len(enriched) == 3
+    assert CountingGeocoder.calls == 1
+    assert not Spot.objects.filter(pk__in=[spot.pk for spot in spots], timezone__isnull=True).exists()
+    assert geo.get_timezone_finder() is geo.get_timezone_finder()
+
+
+@pytest.mark.django_db
+def test_snapshot(django_assert_num_queries):
+    spots = [create_spot(), create_spot(), create_spot()]
+    Spot.objects.filter(pk=spots[2].pk).update(enabled=False)
+    now = timezone.now()
+
+    ingest_detections([(spots[0], now, 5), (spots[0], now - datetime.timedelta(minutes=1), 3), (spots[1], now, 2)])
+    # An older detection arriving late doesn't roll back the current count
+    ingest_detections([(spots[0], now - datetime.timedelta(minutes=5), 9)])
+    SurfQualityDataPoint.objects.create(spot=spots[0], rating=SurfQualityRating.FAIR, timestamp=now)
+    AverageDataPoint.objects.create(spot=spots[0], count=4, timestamp=now)
+    hour = HourIdentifierEnum(now.astimezone(pytz.timezone(spots[0].timezone)).hour)
+    HourlyAverageDataPoint.objects.update_or_create(spot=spots[0], hour_id=hour, defaults=dict(count=6))
+
+    with django_assert_num_queries(1):
+        snapshot = list(Spot.objects.snapshot())
+
+    assert [row["pk"] for row in snapshot] == [spots[0].pk, spots[1].pk]
+    first, second = snapshot
+    assert (first["current_count"], first["latest_detection_count"], first["latest_detection_at"]) == (5, 5, now)
+    assert first["current_surf_quality"] == SurfQualityRating.FAIR
+    assert (first["latest_average_count"], first["hourly_baseline"]) == (4, 6)
+    assert (second["current_count"], second["current_surf_quality"], second["latest_average_count"]) == (2, None, None)
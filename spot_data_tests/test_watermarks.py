@@ -0,0 +1,47 @@
+import django
+
+django.setup()
+
+import pytest
+from django.db import connections
+
+from counter.models import DetectionDataPoint
+from counter.watermarks import committed_id_bound
+
+from .factories import create_spot
+
+
+@pytest.mark.django_db
+def test_committed_id_bound_waits_for_open_writers():
+    spot = create_spot()
+    point = DetectionDataPoint.objects.create(spot=spot, count=1)
+    assert committed_id_bound(DetectionDataPoint) == point.pk
+
+    other = connections.create_connection("default")
+    try:
+        other.set_autocommit(False)
+        with other.cursor() as cursor:
+            # A writer that might still commit rows with lower ids
+            cursor.execute("SELECT txid_current()")
+        assert committed_id_bound(DetectionDataPoint, timeout=0.2) is None
+
+        other.commit()
+        assert committed_id_bound(DetectionDataPoint, timeout=0.2) == point.pk
+    finally:
+        other.close()
+
+
+@pytest.mark.django_db
+def test_committed_id_bound_ignores_other_databases():
+    spot = create_spot()
+    point = DetectionDataPoint.objects.create(spot=spot, count=1)
+
+    settings = {**connections["default"].settings_dict, "NAME": "postgres"}
+    other = connections["default"].__class__(settings, alias="other_database")
+    try:
+        other.set_autocommit(False)
+        with other.cursor() as cursor:
+            cursor.execute("SELECT txid_current()")
+        assert committed_id_bound(DetectionDataPoint, timeout=0.2) == point.pk
+    finally:
+        other.close()